@@ -3,14 +3,20 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from tortoise import Tortoise
 
+from app.core.audit import audit_sink
 from app.core.exceptions import SettingNotFound
 from app.core.init_app import (
     init_data,
     make_middlewares,
     register_exceptions,
+    register_jobs,
     register_routers,
 )
-from app.core.redis import init_redis, close_redis
+from app.core.revocation import revocation_filter
+from app.core.scheduler import scheduler
+from app.core.session_store import close_session_store, init_session_store
+from app.log import logger
+from app.utils.password import password_hasher
 
 try:
     from app.settings.config import settings
@@ -21,10 +27,21 @@ except ImportError:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_data()
-    await init_redis()
+    await init_session_store()
+    await audit_sink.start()
+    if settings.AUTH_STATELESS:
+        try:
+            await revocation_filter.sync()
+        except Exception as e:
+            logger.warning(f"Revocation filter initial sync failed: {repr(e)}")
+    register_jobs()
+    await scheduler.start()
     yield
+    await scheduler.stop()
+    await audit_sink.stop()
     await Tortoise.close_connections()
-    await close_redis()
+    await close_session_store()
+    password_hasher.shutdown()
 
 
 def create_app() -> FastAPI:
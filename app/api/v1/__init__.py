@@ -8,6 +8,7 @@ from .base import base_router
 from .depts import depts_router
 from .gitlab import gitlab_router
 from .menus import menus_router
+from .monitor import monitor_router
 from .roles import roles_router
 from .users import users_router
 
@@ -21,3 +22,4 @@ v1_router.include_router(apis_router, prefix="/api", dependencies=[DependPermiss
 v1_router.include_router(depts_router, prefix="/dept", dependencies=[DependPermission])
 v1_router.include_router(auditlog_router, prefix="/auditlog", dependencies=[DependPermission])
 v1_router.include_router(gitlab_router, prefix="/gitlab", dependencies=[DependPermission])
+v1_router.include_router(monitor_router, prefix="/monitor", dependencies=[DependPermission])
@@ -1,15 +1,21 @@
 from datetime import datetime
+from typing import Optional
+
 from fastapi import APIRouter, Query
-from tortoise.expressions import Q
+from fastapi.responses import StreamingResponse
 
+from app.controllers.auditlog import auditlog_controller
+from app.controllers.auditlog_rollup import auditlog_rollup_controller
+from app.core.audit import audit_policy
 from app.models.admin import AuditLog
-from app.schemas import SuccessExtra
+from app.schemas import Success, SuccessExtra
 from app.schemas.apis import *
 
 router = APIRouter()
 
 
 @router.get("/list", summary="查看操作日志")
+@audit_policy("metadata")
 async def get_audit_log_list(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
@@ -21,28 +27,93 @@ async def get_audit_log_list(
     status: int = Query(None, description="状态码"),
     start_time: datetime = Query("", description="开始时间"),
     end_time: datetime = Query("", description="结束时间"),
+    cursor: Optional[str] = Query(None, description="游标, 传入时使用游标分页并忽略page"),
+    with_total: Optional[bool] = Query(
+        None, description="是否统计总数, 不统计时total为null; 默认页码分页统计, 游标分页不统计"
+    ),
 ):
-    q = Q()
-    if username:
-        q &= Q(username__icontains=username)
-    if module:
-        q &= Q(module__icontains=module)
-    if method:
-        q &= Q(method__icontains=method)
-    if summary:
-        q &= Q(summary__icontains=summary)
-    if path:
-        q &= Q(path__icontains=path)
-    if status:
-        q &= Q(status=status)
-    if start_time and end_time:
-        q &= Q(created_at__range=[start_time, end_time])
-    elif start_time:
-        q &= Q(created_at__gte=start_time)
-    elif end_time:
-        q &= Q(created_at__lte=end_time)
-
-    audit_log_objs = await AuditLog.filter(q).offset((page - 1) * page_size).limit(page_size).order_by("-created_at")
-    total = await AuditLog.filter(q).count()
-    data = [await audit_log.to_dict() for audit_log in audit_log_objs]
+    q = auditlog_controller.build_search(
+        username=username,
+        module=module,
+        method=method,
+        summary=summary,
+        path=path,
+        status=status,
+        start_time=start_time,
+        end_time=end_time,
+    )
+
+    if with_total is None:
+        # 游标分页逐页滚动时每次都 COUNT(*) 会抵消游标的收益, 需要时显式传 with_total=true
+        with_total = cursor is None
+    total = await AuditLog.filter(q).count() if with_total else None
+    if cursor is not None:
+        # 游标分页: 传空字符串获取第一页, 之后传上一页返回的 next_cursor
+        data, next_cursor = await auditlog_controller.list_by_cursor(q, page_size, cursor)
+        return SuccessExtra(data=data, total=total, page_size=page_size, next_cursor=next_cursor)
+
+    data = await auditlog_controller.list_summary(q, page, page_size)
     return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+
+
+@router.get("/export", summary="导出操作日志")
+@audit_policy("metadata")
+async def export_audit_log(
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="导出格式: csv/ndjson"),
+    with_payload: bool = Query(False, description="是否包含请求参数和响应体"),
+    username: str = Query("", description="操作人名称"),
+    module: str = Query("", description="功能模块"),
+    method: str = Query("", description="请求方法"),
+    summary: str = Query("", description="接口描述"),
+    path: str = Query("", description="请求路径"),
+    status: int = Query(None, description="状态码"),
+    start_time: datetime = Query("", description="开始时间"),
+    end_time: datetime = Query("", description="结束时间"),
+):
+    q = auditlog_controller.build_search(
+        username=username,
+        module=module,
+        method=method,
+        summary=summary,
+        path=path,
+        status=status,
+        start_time=start_time,
+        end_time=end_time,
+    )
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"auditlog-{datetime.now().strftime('%Y%m%d%H%M%S')}.{format}"
+    return StreamingResponse(
+        auditlog_controller.export(q, fmt=format, with_payload=with_payload),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/rollup", summary="查看接口请求量与响应时间汇总")
+@audit_policy("metadata")
+async def get_audit_log_rollup(
+    granularity: str = Query("minute", pattern="^(minute|hour)$", description="汇总粒度: minute/hour"),
+    method: str = Query("", description="请求方法"),
+    path: str = Query("", description="请求路径"),
+    start_time: datetime = Query("", description="开始时间"),
+    end_time: datetime = Query("", description="结束时间"),
+    merge: bool = Query(False, description="是否把时间范围内的汇总按接口合并"),
+):
+    data = await auditlog_rollup_controller.query(
+        granularity=granularity,
+        start_time=start_time,
+        end_time=end_time,
+        method=method,
+        path=path,
+        merge=merge,
+    )
+    return Success(data=data)
+
+
+@router.get("/get", summary="查看操作日志详情")
+@audit_policy("metadata")
+async def get_audit_log(
+    id: int = Query(..., description="日志ID"),
+):
+    audit_log_obj = await auditlog_controller.get(id=id)
+    return Success(data=await audit_log_obj.to_dict())
@@ -2,6 +2,7 @@ import jwt
 from fastapi import APIRouter, Header
 
 from app.controllers.user import user_controller
+from app.core.audit import audit_policy
 from app.core.ctx import CTX_USER_ID
 from app.core.dependency import DependAuth
 from app.models.admin import Api, Menu, Role, User
@@ -10,8 +11,10 @@ from app.schemas.login import CredentialsSchema, JWTOut, RefreshTokenRequest
 from app.schemas.users import UpdatePassword
 from app.settings import settings
 from app.utils.jwt_utils import create_tokens
-from app.utils.password import get_password_hash, verify_password
+from app.utils.password import get_password_hash_async, verify_password_async
 from app.utils.token_utils import (
+    get_token_version,
+    revoke_token_in_redis,
     store_token_in_redis,
     validate_refresh_token_from_redis,
     revoke_all_user_tokens_in_redis,
@@ -25,16 +28,20 @@ async def login_access_token(credentials: CredentialsSchema):
     user: User = await user_controller.authenticate(credentials)
     await user_controller.update_last_login(user.id)
 
-    # Create both access and refresh tokens
-    access_token, refresh_token = create_tokens(user_id=user.id, username=user.username, is_superuser=user.is_superuser)
+    # Create both access and refresh tokens with the user's current token version
+    token_version = await get_token_version(user.id, use_cache=False)
+    access_token, refresh_token = create_tokens(
+        user_id=user.id, username=user.username, is_superuser=user.is_superuser, token_version=token_version
+    )
 
-    # Store tokens in Redis
+    # Store tokens in the session store
     await store_token_in_redis(
         user_id=user.id,
         access_token=access_token,
         refresh_token=refresh_token,
         username=user.username,
         is_superuser=user.is_superuser,
+        token_version=token_version,
     )
 
     data = JWTOut(
@@ -46,6 +53,7 @@ async def login_access_token(credentials: CredentialsSchema):
 
 
 @router.get("/userinfo", summary="查看用户信息", dependencies=[DependAuth])
+@audit_policy("errors")
 async def get_userinfo():
     user_id = CTX_USER_ID.get()
     user_obj = await user_controller.get(id=user_id)
@@ -55,6 +63,7 @@ async def get_userinfo():
 
 
 @router.get("/usermenu", summary="查看用户菜单", dependencies=[DependAuth])
+@audit_policy("errors")
 async def get_user_menu():
     user_id = CTX_USER_ID.get()
     user_obj = await User.filter(id=user_id).first()
@@ -83,6 +92,7 @@ async def get_user_menu():
 
 
 @router.get("/userapi", summary="查看用户API", dependencies=[DependAuth])
+@audit_policy("errors")
 async def get_user_api():
     user_id = CTX_USER_ID.get()
     user_obj = await User.filter(id=user_id).first()
@@ -117,18 +127,21 @@ async def refresh_access_token(request: RefreshTokenRequest):
             return Fail(code=401, msg="用户不存在")
 
         # Create new access and refresh tokens
+        token_version = await get_token_version(user.id, use_cache=False)
         new_access_token, new_refresh_token = create_tokens(
-            user_id=user.id, username=username, is_superuser=is_superuser
+            user_id=user.id, username=username, is_superuser=is_superuser, token_version=token_version
         )
 
-        # Store new tokens in Redis
+        # Store new tokens and retire the used refresh token
         await store_token_in_redis(
             user_id=user.id,
             access_token=new_access_token,
             refresh_token=new_refresh_token,
             username=username,
             is_superuser=is_superuser,
+            token_version=token_version,
         )
+        await revoke_token_in_redis(user.id, request.refresh_token, token_type="refresh")
 
         data = JWTOut(
             access_token=new_access_token,
@@ -156,7 +169,7 @@ async def logout(token: str = Header(..., description="access token")):
         except jwt.ExpiredSignatureError:
             return Fail(code=401, msg="访问令牌已过期")
 
-        # Revoke all user tokens in Redis
+        # Revoke all user tokens by bumping the user's token version
         await revoke_all_user_tokens_in_redis(user_id)
 
         return Success(msg="登出成功")
@@ -168,10 +181,10 @@ async def logout(token: str = Header(..., description="access token")):
 async def update_user_password(req_in: UpdatePassword):
     user_id = CTX_USER_ID.get()
     user = await user_controller.get(user_id)
-    verified = verify_password(req_in.old_password, user.password)
+    verified = await verify_password_async(req_in.old_password, user.password)
     if not verified:
         return Fail(msg="旧密码验证错误！")
-    user.password = get_password_hash(req_in.new_password)
+    user.password = await get_password_hash_async(req_in.new_password)
     await user.save()
 
     # Revoke all user tokens when password is changed for security
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+
+from app.core.audit import audit_sink
+from app.core.redis import get_redis_pool_stats
+from app.core.scheduler import scheduler
+from app.schemas.base import Success
+from app.settings import settings
+from app.utils.password import password_hasher
+
+router = APIRouter()
+
+
+@router.get("/runtime", summary="查看运行时指标")
+async def get_runtime_metrics():
+    data = {
+        "session_store": settings.SESSION_STORE_BACKEND,
+        "redis": get_redis_pool_stats(),
+        "password_hasher": password_hasher.stats(),
+        "scheduler": scheduler.stats(),
+        "audit_sink": audit_sink.stats(),
+    }
+    return Success(data=data)
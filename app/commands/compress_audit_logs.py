@@ -0,0 +1,38 @@
+import asyncio
+
+from tortoise import Tortoise
+
+from app.commands.base import BaseCommand
+from app.controllers.auditlog import auditlog_controller
+from app.settings.config import settings
+
+
+class CompressAuditLogsCommand(BaseCommand):
+    help = "Rewrite existing audit log payloads with the configured compression codec."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of audit logs rewritten per batch",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Rewrite from the first audit log, e.g. after changing the codec",
+        )
+
+    def handle(self, *args, **options):
+        # Run the async compress_audit_logs function
+        asyncio.run(self.compress_audit_logs(options.get("batch_size") or 500, options.get("restart", False)))
+
+    async def compress_audit_logs(self, batch_size=500, restart=False):
+        # Initialize Tortoise
+        await Tortoise.init(config=settings.TORTOISE_ORM)
+        try:
+            total = await auditlog_controller.compress_payloads(batch_size=batch_size, restart=restart)
+        finally:
+            await Tortoise.close_connections()
+
+        print(f"Rewrote payloads of {total} audit logs with {settings.AUDIT_PAYLOAD_CODEC}.")
@@ -0,0 +1,30 @@
+import asyncio
+
+from app.commands.base import BaseCommand
+from app.core.session_store import close_session_store, init_session_store
+from app.utils.token_utils import migrate_legacy_tokens_in_redis
+
+
+class MigrateTokensCommand(BaseCommand):
+    help = "Migrate tokens stored under the legacy Redis key layout to the token index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of keys fetched per SCAN iteration",
+        )
+
+    def handle(self, *args, **options):
+        # Run the async migrate_tokens function
+        asyncio.run(self.migrate_tokens(options.get("batch_size") or 500))
+
+    async def migrate_tokens(self, batch_size=500):
+        await init_session_store()
+        try:
+            migrated = await migrate_legacy_tokens_in_redis(batch_size=batch_size)
+        finally:
+            await close_session_store()
+
+        print(f"Migrated {migrated} tokens to the token index.")
@@ -0,0 +1,381 @@
+import asyncio
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from tortoise.expressions import Q, RawSQL
+
+from app.core.crud import CRUDBase
+from app.models.admin import AuditLog, RollupWatermark, month_key
+from app.settings import settings
+
+
+FULLTEXT_FIELDS = ("username", "module", "summary", "path")
+# 全文索引的最短关键字: SQLite trigram 为3, MySQL ngram 默认 ngram_token_size=2
+FULLTEXT_MIN_LENGTH = {"sqlite": 3, "mysql": 2}
+
+
+def fts_phrase(term: str) -> str:
+    """把关键字作为一个短语, 不解析其中的全文检索运算符"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def sql_literal(value: str, backslash: bool = False) -> str:
+    # RawSQL 不支持参数绑定, 以字符串字面量拼接, 转义引号(MySQL还需转义反斜杠)
+    if backslash:
+        value = value.replace("\\", "\\\\")
+    return "'" + value.replace("'", "''") + "'"
+
+
+class AuditLogController(CRUDBase[AuditLog, BaseModel, BaseModel]):
+    # 游标分页的排序, id 保证 created_at 相同时顺序稳定
+    cursor_order = ("-created_at", "-id")
+    # 压缩已有记录的进度
+    compress_watermark = "audit_compress"
+    # 列表只查询摘要字段, 请求参数和响应体通过详情接口按需获取
+    list_fields = (
+        "id",
+        "user_id",
+        "username",
+        "module",
+        "summary",
+        "method",
+        "path",
+        "status",
+        "response_time",
+        "request_truncated",
+        "response_truncated",
+        "created_at",
+        "updated_at",
+    )
+
+    def __init__(self):
+        super().__init__(model=AuditLog)
+        # 已建立全文索引的数据库类型, None 表示使用 icontains
+        self.fulltext: Optional[str] = None
+
+    def build_search(
+        self,
+        username: str = "",
+        module: str = "",
+        method: str = "",
+        summary: str = "",
+        path: str = "",
+        status: Optional[int] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> Q:
+        q = self.build_text_search(username=username, module=module, summary=summary, path=path)
+        if method:
+            q &= Q(method__icontains=method)
+        if status:
+            q &= Q(status=status)
+        if start_time and end_time:
+            q &= Q(created_at__range=[start_time, end_time])
+        elif start_time:
+            q &= Q(created_at__gte=start_time)
+        elif end_time:
+            q &= Q(created_at__lte=end_time)
+        return q
+
+    def build_text_search(self, **terms: str) -> Q:
+        """
+        子串搜索: 建立了全文索引时使用索引, 否则(或关键字短于分词长度时)使用 icontains
+        - SQLite: FTS5 trigram 索引, 关键字至少3个字符
+        - MySQL: ngram FULLTEXT 索引, 关键字至少2个字符
+        """
+        q = Q()
+        indexed = {}
+        for field, term in terms.items():
+            if not term:
+                continue
+            if self.fulltext is not None and len(term) >= FULLTEXT_MIN_LENGTH[self.fulltext]:
+                indexed[field] = term
+            else:
+                q &= Q(**{f"{field}__icontains": term})
+        if not indexed:
+            return q
+
+        table = self.model._meta.db_table
+        if self.fulltext == "sqlite":
+            expr = " AND ".join(f"{field} : {fts_phrase(term)}" for field, term in indexed.items())
+            return q & Q(id__in=RawSQL(f"(SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH {sql_literal(expr)})"))
+        for field, term in indexed.items():
+            # MySQL 布尔模式的短语中不能转义双引号, 直接去掉
+            against = sql_literal('"' + term.replace('"', " ") + '"', backslash=True)
+            q &= Q(id__in=RawSQL(f"(SELECT id FROM {table} WHERE MATCH({field}) AGAINST ({against} IN BOOLEAN MODE))"))
+        return q
+
+    async def ensure_fulltext_index(self) -> None:
+        """创建审计日志的全文索引(可重复执行), 不支持的数据库继续使用 icontains"""
+        conn = self.model._meta.db
+        dialect = conn.capabilities.dialect
+        table = self.model._meta.db_table
+        columns = ", ".join(FULLTEXT_FIELDS)
+        if dialect == "sqlite":
+            _, rows = await conn.execute_query(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name=?", [f"{table}_fts"]
+            )
+            new_columns = ", ".join(f"new.{field}" for field in FULLTEXT_FIELDS)
+            old_columns = ", ".join(f"old.{field}" for field in FULLTEXT_FIELDS)
+            # 外部内容表: 索引只保存分词, 由触发器在写入时同步
+            await conn.execute_script(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                    {columns}, content='{table}', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {columns} ON {table} BEGIN
+                    INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+                    INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+                END;
+                """
+            )
+            if not rows:
+                # 首次创建时为已有数据建立索引
+                await conn.execute_script(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild');")
+        elif dialect == "mysql":
+            _, rows = await conn.execute_query(
+                "SELECT index_name AS name FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND index_type = 'FULLTEXT'",
+                [table],
+            )
+            existing = {row["name"] for row in rows}
+            # MATCH 的列必须与某个全文索引的列完全一致, 每列单独建索引以支持按列搜索
+            for field in FULLTEXT_FIELDS:
+                if f"ft_{table}_{field}" not in existing:
+                    await conn.execute_script(
+                        f"ALTER TABLE {table} ADD FULLTEXT INDEX ft_{table}_{field} ({field}) WITH PARSER ngram"
+                    )
+        else:
+            return
+        self.fulltext = dialect
+
+    @staticmethod
+    def format_row(row: dict) -> dict:
+        """与 to_dict 相同的时间格式"""
+        for field in ("created_at", "updated_at"):
+            if isinstance(row.get(field), datetime):
+                row[field] = row[field].strftime(settings.DATETIME_FORMAT)
+        return row
+
+    async def list_summary(self, search: Q, page: int, page_size: int) -> List[dict]:
+        rows = (
+            await self.model.filter(search)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+            .order_by("-created_at")
+            .values(*self.list_fields)
+        )
+        return [self.format_row(row) for row in rows]
+
+    @staticmethod
+    def encode_cursor(row: dict) -> str:
+        """游标: 当前页最后一条记录的 (created_at, id), 对客户端不透明"""
+        raw = json.dumps([row["created_at"].isoformat(), row["id"]])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(created_at), int(id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="无效的游标")
+
+    def after_cursor(self, cursor: str) -> Q:
+        """排在游标之后的记录: 按 (created_at, id) 倒序的键集条件, 可直接使用 created_at 索引"""
+        return self.after_row(*self.decode_cursor(cursor))
+
+    @staticmethod
+    def after_row(created_at: datetime, id: int) -> Q:
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=id)
+
+    async def iter_rows(self, search: Q, fields: Sequence[str], batch_size: int = 1000) -> AsyncIterator[dict]:
+        """按 (created_at, id) 倒序分批遍历全部匹配的记录, 内存中最多只有一批"""
+        fields = tuple(dict.fromkeys(("id", "created_at", *fields)))
+        after = Q()
+        while True:
+            rows = await self.model.filter(search, after).order_by(*self.cursor_order).limit(batch_size).values(*fields)
+            if not rows:
+                return
+            after = self.after_row(rows[-1]["created_at"], rows[-1]["id"])
+            for row in rows:
+                yield self.format_row(row)
+            if len(rows) < batch_size:
+                return
+
+    async def export(self, search: Q, fmt: str = "csv", with_payload: bool = False) -> AsyncIterator[str]:
+        """以CSV或NDJSON逐批输出匹配的记录"""
+        fields = self.list_fields + (("request_args", "response_body") if with_payload else ())
+        if fmt == "ndjson":
+            async for row in self.iter_rows(search, fields):
+                yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+            return
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        count = 0
+        async for row in self.iter_rows(search, fields):
+            for field in ("request_args", "response_body"):
+                if field in row and not isinstance(row[field], str):
+                    row[field] = json.dumps(row[field], ensure_ascii=False, default=str)
+            writer.writerow(row)
+            count += 1
+            if count % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    async def list_by_cursor(
+        self, search: Q, page_size: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        键集分页: 每页的查询代价与翻页深度无关
+        返回当前页的摘要记录和下一页的游标, 没有下一页时游标为None
+        """
+        query = self.model.filter(search)
+        if cursor:
+            query = query.filter(self.after_cursor(cursor))
+        # 多取一条用于判断是否还有下一页
+        rows = await query.order_by(*self.cursor_order).limit(page_size + 1).values(*self.list_fields)
+        next_cursor = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return [self.format_row(row) for row in rows[:page_size]], next_cursor
+
+    def payload_size(self, obj: AuditLog) -> int:
+        """请求参数和响应体序列化后较大者的字节数"""
+        sizes = [0]
+        for name in ("request_args", "response_body"):
+            value = getattr(obj, name)
+            if value is not None:
+                sizes.append(len(self.model._meta.fields_map[name].encoder(value).encode("utf-8")))
+        return max(sizes)
+
+    async def compress_payloads(
+        self, batch_size: int = 500, min_bytes: Optional[int] = None, restart: bool = False
+    ) -> int:
+        """
+        按当前的压缩配置重写已有记录的请求参数和响应体, 按id分批处理, 返回重写的记录数
+        处理进度保存在水位 compress_watermark 中, 重复执行只处理上次之后写入的记录, 每条记录最多重写一次;
+        序列化后小于 min_bytes 的载荷不会被压缩, 跳过不写; 切换 codec 后用 restart 从头重写
+        """
+        min_bytes = settings.AUDIT_COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+        watermark, _ = await RollupWatermark.get_or_create(name=self.compress_watermark)
+        if restart:
+            watermark.last_id = 0
+            await watermark.save(update_fields=["last_id"])
+        # 开始之后写入的记录已经按当前配置压缩
+        max_id = await self.model.all().order_by("-id").first().values_list("id", flat=True)
+        total = 0
+        while max_id is not None and watermark.last_id < max_id:
+            objs = (
+                await self.model.filter(id__gt=watermark.last_id, id__lte=max_id)
+                .order_by("id")
+                .limit(batch_size)
+                .only("id", "request_args", "response_body")
+            )
+            if not objs:
+                break
+            objs_to_write = [obj for obj in objs if self.payload_size(obj) >= min_bytes]
+            if objs_to_write:
+                await self.model.bulk_update(objs_to_write, fields=["request_args", "response_body"])
+            watermark.last_id = objs[-1].id
+            await watermark.save(update_fields=["last_id"])
+            total += len(objs_to_write)
+        return total
+
+    async def backfill_months(self, batch_size: int = 500) -> int:
+        """为升级前写入的记录补齐归档键"""
+        total = 0
+        while True:
+            rows = await self.model.filter(archive_month__isnull=True).limit(batch_size).values("id", "created_at")
+            if not rows:
+                return total
+            groups: Dict[int, List[int]] = {}
+            for row in rows:
+                groups.setdefault(month_key(row["created_at"]), []).append(row["id"])
+            for month, ids in groups.items():
+                await self.model.filter(id__in=ids).update(archive_month=month)
+            total += len(rows)
+
+    @staticmethod
+    def _publish_archive(tmp_path: str, directory: str, month: int) -> str:
+        """
+        以新文件名发布归档文件, 不覆盖已有的归档:
+        同一月份再次归档(如重放写入的迟到记录)时依次使用 auditlog-{month}-2.jsonl.gz, -3 ...
+        """
+        n = 1
+        while True:
+            name = f"auditlog-{month}.jsonl.gz" if n == 1 else f"auditlog-{month}-{n}.jsonl.gz"
+            path = os.path.join(directory, name)
+            try:
+                # 目标已存在时 link 失败, 不会像 rename 一样覆盖
+                os.link(tmp_path, path)
+            except FileExistsError:
+                n += 1
+                continue
+            os.remove(tmp_path)
+            return path
+
+    async def archive_month(self, month: int, directory: str, batch_size: int = 500) -> Optional[str]:
+        """
+        将一个月的记录导出为 gzip JSONL 文件后删除已导出的记录, 该月没有记录时返回None
+        先写临时文件, 全部写完后再发布并删除数据, 中途失败不会丢失数据;
+        只删除 id 不超过已导出最大id的记录, 导出过程中新写入的记录留到下次归档
+        """
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f"auditlog-{month}.{os.getpid()}.jsonl.gz.tmp")
+        last_id = 0
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            while True:
+                rows = (
+                    await self.model.filter(archive_month=month, id__gt=last_id)
+                    .order_by("id")
+                    .limit(batch_size)
+                    .values()
+                )
+                if not rows:
+                    break
+                lines = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+                await asyncio.to_thread(f.write, lines)
+                last_id = rows[-1]["id"]
+        if not last_id:
+            os.remove(tmp_path)
+            return None
+        path = self._publish_archive(tmp_path, directory, month)
+        await self.model.filter(archive_month=month, id__lte=last_id).delete()
+        return path
+
+    async def expire_months(self, retention_months: int, directory: str) -> List[str]:
+        """归档并删除超过保留月数的月份, 返回归档文件列表"""
+        await self.backfill_months()
+        if retention_months <= 0:
+            return []
+        today = datetime.now()
+        cutoff_index = today.year * 12 + today.month - 1 - retention_months
+        cutoff = (cutoff_index // 12) * 100 + cutoff_index % 12 + 1
+        months = (
+            await self.model.filter(archive_month__lte=cutoff)
+            .distinct()
+            .order_by("archive_month")
+            .values_list("archive_month", flat=True)
+        )
+        paths = [await self.archive_month(month, directory) for month in months]
+        return [path for path in paths if path]
+
+
+auditlog_controller = AuditLogController()
@@ -0,0 +1,223 @@
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from app.core.crud import CRUDBase
+from app.models.admin import AuditLog, AuditLogRollup, RollupWatermark
+from app.settings import settings
+from app.utils.sketch import LatencySketch
+
+GRANULARITIES = ("minute", "hour")
+ROLLUP_FIELDS = ("count", "error_count", "total_time", "max_time", "sketch")
+ROW_FIELDS = ("id", "created_at", "method", "path", "status", "response_time")
+# 最多跟踪的ID空洞数, 防止自增步长不为1等情况下无限增长
+MAX_GAPS = 10000
+
+RollupKey = Tuple[str, datetime, str, str]
+
+
+def truncate(dt: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return dt.replace(second=0, microsecond=0)
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+class Aggregate:
+    __slots__ = ("count", "error_count", "total_time", "max_time", "sketch")
+
+    def __init__(self, sketch: Optional[LatencySketch] = None):
+        self.count = 0
+        self.error_count = 0
+        self.total_time = 0
+        self.max_time = 0
+        self.sketch = sketch or LatencySketch()
+
+    def add(self, status: int, response_time: int) -> None:
+        self.count += 1
+        self.error_count += status >= 400
+        self.total_time += response_time
+        self.max_time = max(self.max_time, response_time)
+        self.sketch.add(response_time)
+
+    def merge(self, other: "Aggregate") -> None:
+        self.count += other.count
+        self.error_count += other.error_count
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.sketch.merge(other.sketch)
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Aggregate":
+        agg = cls(LatencySketch.from_dict(row["sketch"]))
+        agg.count = row["count"]
+        agg.error_count = row["error_count"]
+        agg.total_time = row["total_time"]
+        agg.max_time = row["max_time"]
+        return agg
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "error_count": self.error_count,
+            "avg_time": round(self.total_time / self.count, 2) if self.count else 0,
+            "max_time": self.max_time,
+            **{f"p{int(q * 100)}": self._round(self.sketch.quantile(q)) for q in (0.5, 0.95, 0.99)},
+        }
+
+    @staticmethod
+    def _round(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value, 1)
+
+
+class AuditLogRollupController(CRUDBase[AuditLogRollup, BaseModel, BaseModel]):
+    """
+    按 (method, path) 的分钟/小时级请求量与响应时间汇总
+    以审计日志id为水位增量汇总, 每条日志只被处理一次; 汇总结果可以合并, 查询时不再扫描审计日志表
+    id 不一定按提交顺序可见(多个worker并发 bulk_create、spool重放的大事务), 水位越过的缺失id记为空洞,
+    在 gap_seconds 内每次汇总时补扫, 晚提交的记录仍会被汇总
+    """
+
+    watermark_name = "audit_log"
+
+    def __init__(self, gap_seconds: int = 300):
+        super().__init__(model=AuditLogRollup)
+        self.gap_seconds = gap_seconds
+
+    @staticmethod
+    def _aggregate(rows: List[dict]) -> Dict[RollupKey, Aggregate]:
+        aggregates: Dict[RollupKey, Aggregate] = {}
+        for row in rows:
+            for granularity in GRANULARITIES:
+                key = (granularity, truncate(row["created_at"], granularity), row["method"], row["path"])
+                if key not in aggregates:
+                    aggregates[key] = Aggregate()
+                aggregates[key].add(row["status"], row["response_time"])
+        return aggregates
+
+    def _record_gaps(self, gaps: Dict[str, float], last_id: int, rows: List[dict]) -> None:
+        now = time.time()
+        expected = last_id + 1
+        for row in rows:
+            for missing in range(expected, min(row["id"], expected + MAX_GAPS - len(gaps))):
+                gaps[str(missing)] = now
+            expected = row["id"] + 1
+
+    async def _rollup_gaps(self, watermark: RollupWatermark) -> int:
+        """补扫水位以下的空洞, 丢弃超过 gap_seconds 仍未出现的id"""
+        if not watermark.gaps:
+            return 0
+        cutoff = time.time() - self.gap_seconds
+        gaps = {gap: seen for gap, seen in watermark.gaps.items() if seen >= cutoff}
+        rows = await AuditLog.filter(id__in=[int(gap) for gap in gaps]).values(*ROW_FIELDS) if gaps else []
+        if rows:
+            await self._merge(self._aggregate(rows))
+        for row in rows:
+            gaps.pop(str(row["id"]), None)
+        watermark.gaps = gaps
+        return len(rows)
+
+    async def rollup(self, batch_size: int = 5000) -> int:
+        """汇总水位之后的审计日志以及水位以下晚提交的记录, 返回处理的记录数"""
+        async with in_transaction():
+            watermark, _ = await RollupWatermark.get_or_create(name=self.watermark_name)
+            total = await self._rollup_gaps(watermark)
+            await watermark.save(update_fields=["gaps"])
+        while True:
+            async with in_transaction():
+                watermark, _ = await RollupWatermark.get_or_create(name=self.watermark_name)
+                rows = (
+                    await AuditLog.filter(id__gt=watermark.last_id).order_by("id").limit(batch_size).values(*ROW_FIELDS)
+                )
+                if not rows:
+                    return total
+                await self._merge(self._aggregate(rows))
+                self._record_gaps(watermark.gaps, watermark.last_id, rows)
+                watermark.last_id = rows[-1]["id"]
+                await watermark.save(update_fields=["last_id", "gaps"])
+            total += len(rows)
+
+    async def _merge(self, aggregates: Dict[RollupKey, Aggregate]) -> None:
+        """把本批的汇总合并到已有的时间桶中, 不存在的时间桶新建"""
+        buckets = {key[1] for key in aggregates}
+        paths = {key[3] for key in aggregates}
+        existing = {
+            (obj.granularity, obj.bucket, obj.method, obj.path): obj
+            for obj in await self.model.filter(bucket__in=buckets, path__in=paths)
+        }
+        to_create, to_update = [], []
+        for key, agg in aggregates.items():
+            obj = existing.get(key)
+            if obj is None:
+                granularity, bucket, method, path = key
+                obj = self.model(granularity=granularity, bucket=bucket, method=method, path=path)
+                to_create.append(obj)
+            else:
+                merged = Aggregate.from_row({field: getattr(obj, field) for field in ROLLUP_FIELDS})
+                merged.merge(agg)
+                agg = merged
+                to_update.append(obj)
+            obj.count = agg.count
+            obj.error_count = agg.error_count
+            obj.total_time = agg.total_time
+            obj.max_time = agg.max_time
+            obj.sketch = agg.sketch.to_dict()
+        if to_create:
+            await self.model.bulk_create(to_create)
+        if to_update:
+            await self.model.bulk_update(to_update, fields=[*ROLLUP_FIELDS, "updated_at"])
+
+    async def prune(self, minute_retention_days: int) -> int:
+        """分钟级汇总只保留最近 minute_retention_days 天, 小时级汇总长期保留"""
+        cutoff = datetime.now() - timedelta(days=minute_retention_days)
+        return await self.model.filter(granularity="minute", bucket__lt=cutoff).delete()
+
+    async def query(
+        self,
+        granularity: str = "minute",
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        method: str = "",
+        path: str = "",
+        merge: bool = False,
+    ) -> List[dict]:
+        """
+        查询汇总结果
+        merge=False 时按时间桶返回; merge=True 时把时间范围内的时间桶按 (method, path) 合并,
+        返回整段时间的请求量和分位数
+        """
+        q = Q(granularity=granularity)
+        if start_time:
+            q &= Q(bucket__gte=truncate(start_time, granularity))
+        if end_time:
+            q &= Q(bucket__lte=end_time)
+        if method:
+            q &= Q(method=method)
+        if path:
+            q &= Q(path=path)
+        rows = await self.model.filter(q).order_by("bucket").values("bucket", "method", "path", *ROLLUP_FIELDS)
+        if not merge:
+            return [
+                {
+                    "bucket": row["bucket"].strftime(settings.DATETIME_FORMAT),
+                    "method": row["method"],
+                    "path": row["path"],
+                    **Aggregate.from_row(row).to_dict(),
+                }
+                for row in rows
+            ]
+
+        merged: Dict[Tuple[str, str], Aggregate] = {}
+        for row in rows:
+            key = (row["method"], row["path"])
+            if key not in merged:
+                merged[key] = Aggregate()
+            merged[key].merge(Aggregate.from_row(row))
+        data = [{"method": method, "path": path, **agg.to_dict()} for (method, path), agg in merged.items()]
+        return sorted(data, key=lambda item: item["count"], reverse=True)
+
+
+auditlog_rollup_controller = AuditLogRollupController(gap_seconds=settings.AUDIT_ROLLUP_GAP_SECONDS)
@@ -1,6 +1,7 @@
 from typing import List
 
 from app.core.crud import CRUDBase
+from app.core.permission import permission_engine
 from app.models.admin import Api, Menu, Role
 from app.schemas.roles import RoleCreate, RoleUpdate
 
@@ -22,6 +23,11 @@ class RoleController(CRUDBase[Role, RoleCreate, RoleUpdate]):
         for item in api_infos:
             api_obj = await Api.filter(path=item.get("path"), method=item.get("method")).first()
             await role.apis.add(api_obj)
+        permission_engine.invalidate_role(role.id)
+
+    async def remove(self, id: int) -> None:
+        await super().remove(id=id)
+        permission_engine.invalidate_role(id)
 
 
 role_controller = RoleController()
@@ -1,13 +1,15 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from fastapi.exceptions import HTTPException
 
+from app.core.auth_cache import principal_cache
 from app.core.crud import CRUDBase
+from app.core.permission import permission_engine
 from app.models.admin import User
 from app.schemas.login import CredentialsSchema
 from app.schemas.users import UserCreate, UserUpdate
-from app.utils.password import get_password_hash, verify_password
+from app.utils.password import get_password_hash_async, verify_password_async
 
 from .role import role_controller
 
@@ -23,10 +25,20 @@ class UserController(CRUDBase[User, UserCreate, UserUpdate]):
         return await self.model.filter(username=username).first()
 
     async def create_user(self, obj_in: UserCreate) -> User:
-        obj_in.password = get_password_hash(password=obj_in.password)
+        obj_in.password = await get_password_hash_async(obj_in.password)
         obj = await self.create(obj_in)
         return obj
 
+    async def update(self, id: int, obj_in: Union[UserUpdate, Dict[str, Any]]) -> User:
+        obj = await super().update(id=id, obj_in=obj_in)
+        principal_cache.invalidate_user(obj.id)
+        return obj
+
+    async def remove(self, id: int) -> None:
+        await super().remove(id=id)
+        principal_cache.invalidate_user(id)
+        permission_engine.invalidate_user(id)
+
     async def update_last_login(self, id: int) -> None:
         user = await self.model.get(id=id)
         user.last_login = datetime.now()
@@ -36,7 +48,7 @@ class UserController(CRUDBase[User, UserCreate, UserUpdate]):
         user = await self.model.filter(username=credentials.username).first()
         if not user:
             raise HTTPException(status_code=400, detail="无效的用户名")
-        verified = verify_password(credentials.password, user.password)
+        verified = await verify_password_async(credentials.password, user.password)
         if not verified:
             raise HTTPException(status_code=400, detail="密码错误!")
         if not user.is_active:
@@ -48,13 +60,16 @@ class UserController(CRUDBase[User, UserCreate, UserUpdate]):
         for role_id in role_ids:
             role_obj = await role_controller.get(id=role_id)
             await user.roles.add(role_obj)
+        principal_cache.invalidate_user(user.id)
+        permission_engine.invalidate_user(user.id)
 
     async def reset_password(self, user_id: int):
         user_obj = await self.get(id=user_id)
         if user_obj.is_superuser:
             raise HTTPException(status_code=403, detail="不允许重置超级管理员密码")
-        user_obj.password = get_password_hash(password="123456")
+        user_obj.password = await get_password_hash_async("123456")
         await user_obj.save()
+        principal_cache.invalidate_user(user_obj.id)
 
 
 user_controller = UserController()
@@ -0,0 +1,305 @@
+import asyncio
+import random
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+from app.core.audit_spool import AuditSpool, audit_spool
+from app.log import logger
+from app.models.admin import AuditLog, month_key
+from app.settings.config import settings
+
+
+class AuditPolicy(NamedTuple):
+    """
+    审计策略
+    - always: 记录完整的请求参数和响应体
+    - sampled: 按 rate 比例抽样, 抽中的请求完整记录, 其余不记录
+    - errors: 只记录状态码 >= 400 的请求; 请求开始时还不知道状态码, 请求体只保留有限长度的前缀,
+      响应体在收到状态码后才决定是否捕获, 成功的请求不捕获响应体
+    - metadata: 每个请求都记录, 但只记录路径、用户、状态码和耗时, 不捕获请求体和响应体
+    - never: 不记录
+    """
+
+    mode: str
+    rate: float = 1.0
+
+    ALWAYS = "always"
+    SAMPLED = "sampled"
+    ERRORS = "errors"
+    METADATA = "metadata"
+    NEVER = "never"
+
+    @property
+    def capture_body(self) -> bool:
+        return self.mode in (self.ALWAYS, self.SAMPLED, self.ERRORS)
+
+    def request_body_limit(self, limit: int, errors_limit: int) -> int:
+        """请求体最多捕获的字节数, errors 策略只保留 errors_limit 字节的前缀"""
+        if not self.capture_body:
+            return 0
+        return min(limit, errors_limit) if self.mode == self.ERRORS else limit
+
+    def capture_response(self, status: int) -> bool:
+        """收到响应状态码后决定是否捕获响应体"""
+        return self.capture_body and self.should_record(status)
+
+    def sample(self) -> "AuditPolicy":
+        """在请求开始时决定抽样结果, sampled 转换为 always 或 never"""
+        if self.mode != self.SAMPLED:
+            return self
+        return ALWAYS if random.random() < self.rate else NEVER
+
+    def should_record(self, status: int) -> bool:
+        if self.mode == self.NEVER:
+            return False
+        if self.mode == self.ERRORS:
+            return status >= 400
+        return True
+
+
+ALWAYS = AuditPolicy(AuditPolicy.ALWAYS)
+NEVER = AuditPolicy(AuditPolicy.NEVER)
+POLICY_MODES = (AuditPolicy.ALWAYS, AuditPolicy.SAMPLED, AuditPolicy.ERRORS, AuditPolicy.METADATA, AuditPolicy.NEVER)
+
+
+def parse_policy(value: str) -> AuditPolicy:
+    """解析策略字符串: always / errors / metadata / never / sampled:0.1"""
+    mode, _, rate = value.strip().lower().partition(":")
+    if mode not in POLICY_MODES:
+        raise ValueError(f"Invalid audit policy: {value}")
+    if mode != AuditPolicy.SAMPLED:
+        return AuditPolicy(mode)
+    try:
+        sample_rate = float(rate)
+    except ValueError:
+        raise ValueError(f"Sampled audit policy requires a rate, e.g. sampled:0.1, got {value}")
+    if not 0 <= sample_rate <= 1:
+        raise ValueError(f"Audit sample rate must be between 0 and 1, got {value}")
+    return AuditPolicy(mode, sample_rate)
+
+
+def audit_policy(policy: str) -> Callable:
+    """
+    在接口上声明审计策略, 写在路由装饰器下方:
+        @router.get("/userinfo")
+        @audit_policy("errors")
+        async def get_userinfo(): ...
+    """
+    parsed = parse_policy(policy)
+
+    def decorator(func: Callable) -> Callable:
+        func.__audit_policy__ = parsed
+        return func
+
+    return decorator
+
+
+class AuditPolicies:
+    """
+    按接口解析审计策略, 优先级: 接口上声明的策略 > 路径规则 > 标签规则 > 默认策略
+    rules 的key为 "tag:<标签>" 时按路由标签匹配, 否则作为正则按路径匹配(re.search), 按配置顺序取第一条
+    """
+
+    TAG_PREFIX = "tag:"
+
+    def __init__(self, rules: Dict[str, str], default: str):
+        self.default = parse_policy(default)
+        self.path_rules: list[tuple[re.Pattern, AuditPolicy]] = []
+        self.tag_rules: Dict[str, AuditPolicy] = {}
+        for key, value in rules.items():
+            if key.startswith(self.TAG_PREFIX):
+                self.tag_rules.setdefault(key[len(self.TAG_PREFIX) :], parse_policy(value))
+            else:
+                self.path_rules.append((re.compile(key, re.I), parse_policy(value)))
+
+    def _match_path(self, path: str) -> Optional[AuditPolicy]:
+        for pattern, policy in self.path_rules:
+            if pattern.search(path):
+                return policy
+        return None
+
+    def for_path(self, path: str) -> AuditPolicy:
+        """未匹配到路由的请求(如404)只按路径规则解析"""
+        return self._match_path(path) or self.default
+
+    def for_route(self, path: str, tags: Iterable[str], endpoint: Any = None) -> AuditPolicy:
+        declared = getattr(endpoint, "__audit_policy__", None)
+        if declared is not None:
+            return declared
+        policy = self._match_path(path)
+        if policy is not None:
+            return policy
+        for tag in tags:
+            if tag in self.tag_rules:
+                return self.tag_rules[tag]
+        return self.default
+
+
+class AuditSink:
+    """
+    审计日志异步批量写入器
+    - 请求路径上只做一次入队, 不等待数据库写入
+    - 后台任务按 batch_size 条或每 flush_interval 秒一次 bulk_create
+    - 队列有界: 写满时放入有界的溢出缓冲, 由后台任务批量转写到本地spool(每批一次fsync, 不在请求中等待磁盘);
+      溢出缓冲也写满或未配置spool时丢弃新记录并计数(背压), 不会拖慢请求或耗尽内存
+    - 数据库写入失败的批次转写到本地spool, 由重放任务在数据库恢复后写回
+    - lifespan 关闭时将队列中剩余的记录全部写入
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float, spool: Optional[AuditSpool] = None):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool = spool
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None
+        self._pending: list[dict] = []
+        self._overflow: list[dict] = []
+        self._overflow_ready: Optional[asyncio.Event] = None
+        self._spill_task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._last_drop_log = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def submit(self, data: dict) -> bool:
+        """提交一条审计记录, 被丢弃时返回False"""
+        # 入队时记录请求时间, 批量写入时不会被刷新为写入时间
+        data.setdefault("created_at", datetime.now())
+        data.setdefault("archive_month", month_key(data["created_at"]))
+        if not self.running:
+            # 未启动后台写入(如未经过lifespan)时直接写入
+            await self._write([data])
+            return True
+        try:
+            self._queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            if self.spool is not None and len(self._overflow) < self.maxsize:
+                self._overflow.append(data)
+                self._overflow_ready.set()
+                return True
+            self.dropped += 1
+            now = time.monotonic()
+            if now - self._last_drop_log > 10:
+                self._last_drop_log = now
+                logger.warning(f"Audit queue is full, {self.dropped} records dropped so far")
+            return False
+
+    async def _write(self, batch: list[dict]) -> None:
+        try:
+            await AuditLog.bulk_create([AuditLog(**data) for data in batch])
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            if self.spool is not None and await self.spool.append(batch):
+                logger.warning(f"Failed to write {len(batch)} audit records, spooled to disk: {repr(e)}")
+                return
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} audit records: {repr(e)}")
+
+    async def _collect(self) -> None:
+        """从队列收集一批记录到 _pending, 被取消时已取出的记录仍保留在 _pending 中"""
+        self._pending.append(await self._queue.get())
+        # 不使用 wait_for: 取消与 get 同时完成时 wait_for 会吞掉取消, stop 需要等到 flush_interval 超时
+        try:
+            async with asyncio.timeout(self.flush_interval):
+                while len(self._pending) < self.batch_size:
+                    self._pending.append(await self._queue.get())
+        except TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            await self._collect()
+            batch, self._pending = self._pending, []
+            # 写入过程不随后台任务一起取消, stop 时等待它完成
+            self._writing = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._writing)
+
+    async def _spill(self) -> None:
+        """把溢出缓冲中的记录整批写入spool"""
+        batch, self._overflow = self._overflow, []
+        if batch and not await self.spool.append(batch):
+            self.dropped += len(batch)
+
+    async def _spill_run(self) -> None:
+        while True:
+            await self._overflow_ready.wait()
+            self._overflow_ready.clear()
+            await self._spill()
+
+    async def flush(self) -> None:
+        """写入已取出和队列中当前所有的记录"""
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._pending.append(self._queue.get_nowait())
+        while self._pending:
+            batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size :]
+            await self._write(batch)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        if self.spool is not None:
+            # 接管上次运行遗留的段, 由重放任务写回数据库
+            await asyncio.to_thread(self.spool.recover)
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run())
+        if self.spool is not None:
+            self._overflow_ready = asyncio.Event()
+            self._spill_task = asyncio.create_task(self._spill_run())
+
+    async def stop(self) -> None:
+        if self._spill_task is not None:
+            self._spill_task.cancel()
+            try:
+                await self._spill_task
+            except asyncio.CancelledError:
+                pass
+            self._spill_task = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writing is not None:
+            await self._writing
+            self._writing = None
+        await self.flush()
+        if self.spool is not None:
+            await self._spill()
+            await asyncio.to_thread(self.spool.rotate)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "overflow": len(self._overflow),
+            "maxsize": self.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "spool": self.spool.stats() if self.spool is not None else None,
+        }
+
+
+audit_policies = AuditPolicies(rules=settings.AUDIT_POLICY_RULES, default=settings.AUDIT_DEFAULT_POLICY)
+
+audit_sink = AuditSink(
+    maxsize=settings.AUDIT_QUEUE_MAXSIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    spool=audit_spool if settings.AUDIT_SPOOL_ENABLED else None,
+)
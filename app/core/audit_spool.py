@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import IO, List, Optional
+
+from tortoise.transactions import in_transaction
+
+from app.log import logger
+from app.models.admin import AuditLog
+from app.settings.config import settings
+
+ACTIVE_SUFFIX = ".open"
+SEALED_SUFFIX = ".jsonl"
+CLAIMED_SUFFIX = ".replay"
+QUARANTINE_SUFFIX = ".quarantine"
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditSpool:
+    """
+    审计记录本地落盘缓冲(按段轮转的JSONL预写文件)
+    数据库不可用或写入队列已满时, 审计记录追加到本进程的活动段 {pid}-{时间戳}-{序号}.open;
+    活动段超过 segment_size 字节或重放前封存为 .jsonl, 重放时先把段重命名为 .replay 认领,
+    整段在一个事务内批量写入 AuditLog 后删除, 多个worker共享目录时同一段只会被一个进程重放
+    数据库可用但某段仍写入失败(如表结构变更后字段不兼容)时记录失败次数, 超过 max_attempts 次后
+    改名为 .quarantine 隔离, 不再阻塞其他段的重放
+    """
+
+    def __init__(
+        self, directory: str, segment_size: int, fsync: bool = True, batch_size: int = 500, max_attempts: int = 5
+    ):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._file: Optional[IO[str]] = None
+        self._path: Optional[str] = None
+        self._seq = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.corrupted = 0
+        self.quarantined = 0
+
+    # ---- 写入 ----
+
+    def _open_segment(self) -> IO[str]:
+        os.makedirs(self.directory, exist_ok=True)
+        self._seq += 1
+        name = f"{os.getpid()}-{time.time_ns()}-{self._seq:06d}"
+        self._path = os.path.join(self.directory, name + ACTIVE_SUFFIX)
+        self._file = open(self._path, "a", encoding="utf-8")
+        return self._file
+
+    def _seal(self) -> None:
+        """封存活动段, 之后由重放任务处理"""
+        if self._file is None:
+            return
+        self._file.close()
+        if os.path.getsize(self._path):
+            os.replace(self._path, self._path[: -len(ACTIVE_SUFFIX)] + SEALED_SUFFIX)
+        else:
+            os.remove(self._path)
+        self._file = self._path = None
+
+    @staticmethod
+    def encode(data: dict) -> str:
+        record = dict(data)
+        if isinstance(record.get("created_at"), datetime):
+            record["created_at"] = record["created_at"].isoformat()
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    @staticmethod
+    def decode(line: str) -> dict:
+        record = json.loads(line)
+        if "month" in record:
+            # 归档键改名前写入的段
+            record["archive_month"] = record.pop("month")
+        if record.get("created_at"):
+            record["created_at"] = datetime.fromisoformat(record["created_at"])
+        return record
+
+    def _append(self, lines: str) -> None:
+        with self._lock:
+            f = self._file or self._open_segment()
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            if f.tell() >= self.segment_size:
+                self._seal()
+
+    async def append(self, batch: List[dict]) -> bool:
+        """追加一批记录, 写入失败(如磁盘已满)时返回False"""
+        lines = "".join(self.encode(data) for data in batch)
+        try:
+            await asyncio.to_thread(self._append, lines)
+        except OSError as e:
+            logger.error(f"Failed to spool {len(batch)} audit records: {repr(e)}")
+            return False
+        self.spooled += len(batch)
+        return True
+
+    def rotate(self) -> None:
+        with self._lock:
+            self._seal()
+
+    # ---- 重放 ----
+
+    def recover(self) -> None:
+        """
+        进程启动时接管遗留的段: 已退出进程的活动段直接封存, 已退出进程认领但未完成重放的段恢复为待重放
+        本进程尚未写入任何段, 与当前pid相同的遗留文件来自重启前的同pid进程
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            stem, suffix = os.path.splitext(name)
+            if suffix not in (ACTIVE_SUFFIX, CLAIMED_SUFFIX):
+                continue
+            owner = stem.split("-", 1)[0]
+            path = os.path.join(self.directory, name)
+            if path == self._path or (owner.isdigit() and int(owner) != os.getpid() and pid_alive(int(owner))):
+                continue
+            if os.path.getsize(path):
+                os.replace(path, os.path.join(self.directory, stem + SEALED_SUFFIX))
+            else:
+                os.remove(path)
+
+    def sealed_segments(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(SEALED_SUFFIX))
+
+    def _claim(self, name: str) -> Optional[str]:
+        """
+        认领一个已封存的段, 已被其他进程认领时返回None
+        认领后的文件名以本进程pid开头, 进程退出后可由 recover 恢复
+        """
+        stem = name[: -len(SEALED_SUFFIX)]
+        claimed = os.path.join(self.directory, f"{os.getpid()}-{stem.split('-', 1)[-1]}{CLAIMED_SUFFIX}")
+        try:
+            os.rename(os.path.join(self.directory, name), claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    def _read(self, path: str) -> List[dict]:
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(self.decode(line))
+                except ValueError:
+                    # 进程崩溃时最后一行可能只写了一半
+                    self.corrupted += 1
+                    logger.warning(f"Skipping corrupted audit spool line in {path}")
+        return records
+
+    @staticmethod
+    def attempts(name: str) -> int:
+        """段名 {pid}-{时间戳}-{序号}[.{失败次数}].jsonl 中记录的失败次数"""
+        _, _, attempts = name[: -len(SEALED_SUFFIX)].partition(".")
+        return int(attempts) if attempts.isdigit() else 0
+
+    def _release(self, path: str, name: str) -> str:
+        """重放失败时释放认领的段: 增加失败次数, 超过 max_attempts 次时隔离"""
+        attempts = self.attempts(name) + 1
+        base = name[: -len(SEALED_SUFFIX)].partition(".")[0]
+        if attempts >= self.max_attempts:
+            target = f"{base}{QUARANTINE_SUFFIX}"
+        else:
+            target = f"{base}.{attempts}{SEALED_SUFFIX}"
+        os.replace(path, os.path.join(self.directory, target))
+        return target
+
+    async def _load(self, records: List[dict]) -> None:
+        async with in_transaction():
+            for i in range(0, len(records), self.batch_size):
+                await AuditLog.bulk_create([AuditLog(**data) for data in records[i : i + self.batch_size]])
+
+    @staticmethod
+    async def _database_available() -> bool:
+        try:
+            await AuditLog._meta.db.execute_query("SELECT 1")
+        except Exception:
+            return False
+        return True
+
+    async def replay(self) -> int:
+        """
+        把已封存的段写入 AuditLog, 返回写入的记录数
+        数据库不可用时停止本次重放, 剩余的段等待下次; 数据库可用但单个段写入失败时跳过该段继续重放其他段
+        """
+        await asyncio.to_thread(self.rotate)
+        total = 0
+        for name in self.sealed_segments():
+            path = await asyncio.to_thread(self._claim, name)
+            if path is None:
+                continue
+            records = await asyncio.to_thread(self._read, path)
+            try:
+                await self._load(records)
+            except Exception as e:
+                if not await self._database_available():
+                    # 数据库故障不计入段的失败次数
+                    os.replace(path, os.path.join(self.directory, name))
+                    raise
+                target = self._release(path, name)
+                if target.endswith(QUARANTINE_SUFFIX):
+                    self.quarantined += 1
+                    logger.error(
+                        f"Audit spool segment {name} failed {self.max_attempts} times, moved to {target}: {e!r}"
+                    )
+                else:
+                    logger.warning(f"Failed to replay audit spool segment {name}, will retry: {e!r}")
+                continue
+            os.remove(path)
+            total += len(records)
+            self.replayed += len(records)
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "corrupted": self.corrupted,
+            "quarantined": self.quarantined,
+            "pending_segments": len(self.sealed_segments()) + (self._file is not None),
+        }
+
+
+audit_spool = AuditSpool(
+    directory=settings.AUDIT_SPOOL_DIR,
+    segment_size=settings.AUDIT_SPOOL_SEGMENT_SIZE,
+    fsync=settings.AUDIT_SPOOL_FSYNC,
+    max_attempts=settings.AUDIT_SPOOL_MAX_ATTEMPTS,
+)
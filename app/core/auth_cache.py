@@ -0,0 +1,73 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from app.settings.config import settings
+from app.utils.cache import TTLCache
+
+
+@dataclass(frozen=True, slots=True)
+class AuthedUser:
+    """已认证用户的精简快照, 缓存在进程内, 避免每个请求都查询User表"""
+
+    id: int
+    username: str
+    is_superuser: bool
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user) -> "AuthedUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            is_superuser=user.is_superuser,
+            is_active=user.is_active,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    claims: dict
+    user: AuthedUser
+
+
+class PrincipalCache:
+    """
+    按token摘要缓存已认证的主体(JWT claims + 用户快照)
+    条目过期时间不晚于JWT的exp; 撤销token、修改密码、更新用户时主动失效
+    多进程部署时其他worker的缓存最多在 AUTH_CACHE_TTL_SECONDS 后失效
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, token_hash: str) -> Optional[Principal]:
+        if not self.enabled:
+            return None
+        return self._cache.get(token_hash)
+
+    def set(self, token_hash: str, principal: Principal) -> None:
+        if not self.enabled:
+            return
+        exp = principal.claims.get("exp")
+        ttl = exp - time.time() if exp else None
+        self._cache.set(token_hash, principal, ttl=ttl)
+
+    def invalidate_token(self, token_hash: str) -> None:
+        self._cache.pop(token_hash)
+
+    def invalidate_user(self, user_id: int) -> None:
+        for token_hash, principal in list(self._cache.items()):
+            if principal.user.id == user_id:
+                self._cache.pop(token_hash)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.AUTH_CACHE_MAXSIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    enabled=settings.AUTH_CACHE_ENABLED,
+)
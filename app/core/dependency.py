@@ -1,43 +1,93 @@
 from typing import Optional
+
 import jwt
 from fastapi import Depends, Header, HTTPException, Request
 
+from app.core.auth_cache import AuthedUser, Principal, principal_cache
 from app.core.ctx import CTX_USER_ID
-from app.models import Role, User
+from app.core.exceptions import SessionStoreUnavailable
+from app.core.permission import permission_engine
+from app.core.revocation import revocation_filter
+from app.log import logger
+from app.models import User
 from app.settings import settings
-from app.utils.token_utils import validate_access_token_from_redis, validate_refresh_token_from_redis
+from app.utils.token_utils import (
+    hash_token,
+    validate_access_token_from_redis,
+    validate_refresh_token_from_redis,
+)
 
 
 class AuthControl:
     @classmethod
-    async def is_authed(cls, token: str = Header(..., description="token验证")) -> Optional["User"]:
+    async def is_authed(
+        cls, token: str = Header(..., description="token验证"), request: Request = None
+    ) -> Optional["AuthedUser"]:
+        user = await cls.authenticate(token)
+        if request is not None:
+            # 保存到请求的state中, 审计日志中间件直接读取, 无需再次认证
+            request.state.authed_user = user
+        return user
+
+    @classmethod
+    async def authenticate(cls, token: str) -> Optional["AuthedUser"]:
         try:
 
+            token_hash = None
             # Fallback to JWT validation
             if token == "dev":
                 user = await User.filter().first()
                 user_id = user.id
             else:
-                # First try to validate from Redis
-                token_data = await validate_access_token_from_redis(token)
-                if token_data is None:
-                    raise HTTPException(status_code=401, detail="token不存在或已过期")
+                token_hash = hash_token(token)
+                # 无状态模式且撤销过滤器已同步时, 不访问会话存储
+                stateless = settings.AUTH_STATELESS and revocation_filter.ready
+                principal = principal_cache.get(token_hash)
+                if principal is not None:
+                    if stateless and cls.is_revoked(token_hash, principal.claims):
+                        principal_cache.invalidate_token(token_hash)
+                        raise HTTPException(status_code=401, detail="token已被撤销")
+                    CTX_USER_ID.set(principal.user.id)
+                    return principal.user
+
+                if not stateless:
+                    try:
+                        # First try to validate from Redis
+                        token_data = await validate_access_token_from_redis(token)
+                    except SessionStoreUnavailable as e:
+                        if not settings.REDIS_FALLBACK_SIGNATURE_ONLY:
+                            raise
+                        logger.warning(f"Session store unavailable, falling back to signature-only auth: {e}")
+                        stateless = True
+                    else:
+                        if token_data is None:
+                            raise HTTPException(status_code=401, detail="token不存在或已过期")
+                # In stateless mode trust the signature and exp, then consult the in-process revocation filter
                 decode_data = jwt.decode(token, settings.SECRET_KEY, algorithms=settings.JWT_ALGORITHM)
+                if stateless and cls.is_revoked(token_hash, decode_data):
+                    raise HTTPException(status_code=401, detail="token已被撤销")
                 user_id = decode_data.get("user_id")
             user = await User.filter(id=user_id).first()
             if not user:
                 raise HTTPException(status_code=401, detail="Authentication failed")
+            authed_user = AuthedUser.from_user(user)
+            if token_hash is not None:
+                principal_cache.set(token_hash, Principal(claims=decode_data, user=authed_user))
             CTX_USER_ID.set(int(user_id))
-            return user
+            return authed_user
         except jwt.DecodeError:
             raise HTTPException(status_code=401, detail="无效的Token")
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="登录已过期")
-        except HTTPException as e:
+        except (HTTPException, SessionStoreUnavailable) as e:
             raise e
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"{repr(e)}")
 
+    @classmethod
+    def is_revoked(cls, token_hash: str, claims: dict) -> bool:
+        return revocation_filter.is_revoked(token_hash, claims.get("user_id"), claims.get("token_version", 0))
+
     @classmethod
     async def is_refresh_token_valid(cls, refresh_token: str) -> Optional["User"]:
         """
@@ -59,22 +109,23 @@ class AuthControl:
             raise HTTPException(status_code=401, detail="无效的刷新令牌")
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="刷新令牌已过期")
+        except SessionStoreUnavailable as e:
+            raise e
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"{repr(e)}")
 
 
 class PermissionControl:
     @classmethod
-    async def has_permission(cls, request: Request, current_user: User = Depends(AuthControl.is_authed)) -> None:
+    async def has_permission(cls, request: Request, current_user: AuthedUser = Depends(AuthControl.is_authed)) -> None:
         if current_user.is_superuser:
             return
         method = request.method
-        path = request.url.path
-        roles: list[Role] = await current_user.roles
-        if not roles:
+        path = await permission_engine.resolve_path(request)
+        role_ids = await permission_engine.get_user_role_ids(current_user.id)
+        if not role_ids:
             raise HTTPException(status_code=403, detail="The user is not bound to a role")
-        apis = [await role.apis for role in roles]
-        permission_apis = list(set((api.method, api.path) for api in sum(apis, [])))
+        permission_apis = await permission_engine.get_grants(role_ids)
         # path = "/api/v1/auth/userinfo"
         # method = "GET"
         if (method, path) not in permission_apis:
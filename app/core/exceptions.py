@@ -12,6 +12,12 @@ class SettingNotFound(Exception):
     pass
 
 
+class SessionStoreUnavailable(Exception):
+    """会话存储(Redis)不可用或熔断器已打开"""
+
+    pass
+
+
 async def DoesNotExistHandle(req: Request, exc: DoesNotExist) -> JSONResponse:
     content = dict(
         code=404,
@@ -28,6 +34,11 @@ async def IntegrityHandle(_: Request, exc: IntegrityError) -> JSONResponse:
     return JSONResponse(content=content, status_code=500)
 
 
+async def SessionStoreUnavailableHandle(_: Request, exc: SessionStoreUnavailable) -> JSONResponse:
+    content = dict(code=503, msg=f"会话服务暂不可用, {exc}", data=None)
+    return JSONResponse(content=content, status_code=503)
+
+
 async def HttpExcHandle(_: Request, exc: HTTPException) -> JSONResponse:
     content = dict(code=exc.status_code, msg=exc.detail, data=None)
     return JSONResponse(content=content, status_code=exc.status_code)
@@ -19,6 +19,8 @@ from app.core.exceptions import (
     RequestValidationHandle,
     ResponseValidationError,
     ResponseValidationHandle,
+    SessionStoreUnavailable,
+    SessionStoreUnavailableHandle,
 )
 from app.log import logger
 from app.core.init_data import (
@@ -29,9 +31,16 @@ from app.core.init_data import (
     init_superuser,
 )
 
+from app.controllers.auditlog import auditlog_controller
+from app.core.revocation import revocation_filter
+from app.core.scheduler import scheduler
 from app.settings.config import settings
+from app.tasks.audit_retention import archive_expired_audit_logs
+from app.tasks.audit_rollup import rollup_audit_logs
+from app.tasks.audit_spool import replay_audit_spool
+from app.tasks.token_cleanup import cleanup_expired_tokens
 
-from .middlewares import BackGroundTaskMiddleware, HttpAuditLogMiddleware
+from .middlewares import BackGroundTaskMiddleware, HttpAuditLogMiddleware, route_index
 
 
 def make_middlewares():
@@ -63,10 +72,37 @@ def register_exceptions(app: FastAPI):
     app.add_exception_handler(IntegrityError, IntegrityHandle)
     app.add_exception_handler(RequestValidationError, RequestValidationHandle)
     app.add_exception_handler(ResponseValidationError, ResponseValidationHandle)
+    app.add_exception_handler(SessionStoreUnavailable, SessionStoreUnavailableHandle)
 
 
 def register_routers(app: FastAPI, prefix: str = "/api"):
     app.include_router(api_router, prefix=prefix)
+    route_index.build(app.routes)
+
+
+def register_jobs():
+    # 只需要集群中一个worker执行的维护任务, SCHEDULER_ENABLED=False 时由外部(如cron或单独的进程)负责
+    if settings.SCHEDULER_ENABLED:
+        scheduler.add_job("token_cleanup", cleanup_expired_tokens, interval=settings.TOKEN_CLEANUP_INTERVAL_SECONDS)
+        scheduler.add_job(
+            "audit_retention", archive_expired_audit_logs, interval=settings.AUDIT_RETENTION_INTERVAL_SECONDS
+        )
+        scheduler.add_job("audit_rollup", rollup_audit_logs, interval=settings.AUDIT_ROLLUP_INTERVAL_SECONDS)
+    # 每个worker都要执行的本地任务, 不受 SCHEDULER_ENABLED 控制: 本进程的落盘缓冲和吊销过滤器只能由自己同步
+    if settings.AUDIT_SPOOL_ENABLED:
+        scheduler.add_job(
+            "audit_spool_replay",
+            replay_audit_spool,
+            interval=settings.AUDIT_SPOOL_REPLAY_INTERVAL_SECONDS,
+            leader_only=False,
+        )
+    if settings.AUTH_STATELESS:
+        scheduler.add_job(
+            "revocation_sync",
+            revocation_filter.sync,
+            interval=settings.REVOCATION_SYNC_INTERVAL_SECONDS,
+            leader_only=False,
+        )
 
 
 async def init_db():
@@ -86,6 +122,12 @@ async def init_db():
 
     await command.upgrade(run_in_transaction=True)
 
+    if settings.AUDIT_FULLTEXT_ENABLED:
+        try:
+            await auditlog_controller.ensure_fulltext_index()
+        except Exception as e:
+            logger.warning(f"Unable to create the audit log fulltext index, falling back to LIKE search: {repr(e)}")
+
 
 async def init_data():
     await init_db()
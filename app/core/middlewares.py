@@ -1,19 +1,17 @@
 import json
 import re
-from datetime import datetime
-from typing import Any, AsyncGenerator
+import time
+from typing import Any, Iterable, NamedTuple, Optional, Tuple
 
-from fastapi import FastAPI
-from fastapi.responses import Response
+import jwt
 from fastapi.routing import APIRoute
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.datastructures import Headers
 from starlette.requests import Request
-from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app.core.dependency import AuthControl
-from app.models.admin import AuditLog, User
-from app.tasks.token_cleanup import cleanup_expired_tokens
-from app.log import logger
+from app.core.audit import AuditPolicy, audit_policies, audit_sink
+from app.settings.config import settings
 
 from .bgtask import BgTasks
 
@@ -41,29 +39,118 @@ class SimpleBaseMiddleware:
 
 
 class BackGroundTaskMiddleware(SimpleBaseMiddleware):
-    # Track last cleanup time
-    last_cleanup = datetime.now()
-
     async def before_request(self, request):
         await BgTasks.init_bg_tasks_obj()
 
     async def after_request(self, request):
-        # Run token cleanup every hour
-        now = datetime.now()
-        if (now - self.last_cleanup).total_seconds() > 600:  # 1 minute for testing
-            logger.debug("Running token cleanup")
-            await BgTasks.add_task(cleanup_expired_tokens)
-            self.last_cleanup = now
         await BgTasks.execute_tasks()
 
 
-class HttpAuditLogMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, methods: list[str], exclude_paths: list[str]):
-        super().__init__(app)
+class BodyCapture:
+    """
+    旁路捕获流经的body, 最多保留 limit 字节, 超出部分只计数不保存
+    每个请求的内存占用不超过 limit, 与响应大小无关
+    """
+
+    __slots__ = ("limit", "buffer", "size", "total")
+
+    def __init__(self, limit: int, size_hint: Optional[int] = None):
+        self.limit = limit
+        # 已知长度时按 min(长度, limit) 预分配, 避免逐块扩容
+        self.buffer = bytearray(min(size_hint, limit)) if size_hint else bytearray()
+        self.size = 0
+        self.total = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        n = min(len(chunk), self.limit - self.size)
+        if n <= 0:
+            return
+        view = memoryview(chunk)[:n]
+        if self.size + n <= len(self.buffer):
+            self.buffer[self.size : self.size + n] = view
+        else:
+            del self.buffer[self.size :]
+            self.buffer += view
+        self.size += n
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self.size
+
+    def getvalue(self) -> bytes:
+        return bytes(memoryview(self.buffer)[: self.size])
+
+
+class RouteMeta(NamedTuple):
+    module: str
+    summary: Optional[str]
+    policy: AuditPolicy
+
+
+class RouteIndex:
+    """
+    路由元数据索引: APIRoute -> (module, summary, policy)
+    路由匹配后 FastAPI 会把匹配到的路由放在 scope["route"] 中, 审计时按它直接查表,
+    无需对每个路由逐个做正则匹配; 审计策略在建索引时解析, 请求路径上不再匹配规则
+    """
+
+    def __init__(self):
+        # APIRoute 不可哈希, 以对象id为key, 同时保留路由引用避免id被复用
+        self._meta: dict[int, Tuple[APIRoute, RouteMeta]] = {}
+
+    def build(self, routes: Iterable[BaseRoute]) -> None:
+        self._meta = {id(route): self._route_meta(route) for route in routes if isinstance(route, APIRoute)}
+
+    @staticmethod
+    def _route_meta(route: APIRoute) -> Tuple[APIRoute, RouteMeta]:
+        policy = audit_policies.for_route(route.path, route.tags, route.endpoint)
+        return route, RouteMeta(",".join(route.tags), route.summary, policy)
+
+    def lookup(self, scope: Scope) -> Optional[RouteMeta]:
+        route = scope.get("route")
+        if not isinstance(route, APIRoute):
+            return None
+        meta = self._meta.get(id(route))
+        if meta is None:
+            # 在 register_routers 之后注册的路由, 首次访问时补充到索引中
+            meta = self._meta[id(route)] = self._route_meta(route)
+        return meta[1]
+
+
+route_index = RouteIndex()
+
+
+def get_content_length(headers: Headers) -> Optional[int]:
+    try:
+        return int(headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+
+class HttpAuditLogMiddleware:
+    """
+    审计日志中间件(纯ASGI实现)
+    通过包装 receive/send 旁路捕获请求体和响应体, 响应原样流式转发给客户端,
+    不经过 BaseHTTPMiddleware 的额外任务和内存流
+    请求体和响应体最多各捕获 max_body_size 字节(errors 策略的请求体只保留 errors_body_size 字节的前缀),
+    超出时标记 request_truncated / response_truncated
+    每个请求按路由的审计策略(AuditPolicy)决定是否记录以及是否捕获请求体和响应体,
+    策略在路由匹配后、读取请求体之前确定
+    """
+
+    def __init__(self, app: ASGIApp, methods: list[str], exclude_paths: list[str]):
+        self.app = app
         self.methods = methods
         self.exclude_paths = exclude_paths
-        self.audit_log_paths = ["/api/v1/auditlog/list"]
-        self.max_body_size = 1024 * 1024  # 1MB 响应体大小限制
+        self.exclude_patterns = [re.compile(path, re.I) for path in exclude_paths]
+        self.max_body_size = settings.AUDIT_MAX_BODY_SIZE
+        self.errors_body_size = settings.AUDIT_ERRORS_REQUEST_BODY_SIZE
+
+    def should_audit(self, scope: Scope) -> bool:
+        if scope["method"] not in self.methods:
+            return False
+        return not any(pattern.search(scope["path"]) for pattern in self.exclude_patterns)
 
     async def get_request_args(self, request: Request) -> dict:
         args = {}
@@ -89,40 +176,15 @@ class HttpAuditLogMiddleware(BaseHTTPMiddleware):
                             args[k] = v
                 except Exception:
                     pass
+            except Exception:
+                pass
 
         return args
 
-    async def get_response_body(self, request: Request, response: Response) -> Any:
-        # 检查Content-Length
-        content_length = response.headers.get("content-length")
-        if content_length and int(content_length) > self.max_body_size:
-            return {"code": 0, "msg": "Response too large to log", "data": None}
-
-        if hasattr(response, "body"):
-            body = response.body
-        else:
-            body_chunks = []
-            async for chunk in response.body_iterator:
-                if not isinstance(chunk, bytes):
-                    chunk = chunk.encode(response.charset)
-                body_chunks.append(chunk)
-
-            response.body_iterator = self._async_iter(body_chunks)
-            body = b"".join(body_chunks)
-
-        if any(request.url.path.startswith(path) for path in self.audit_log_paths):
-            try:
-                data = self.lenient_json(body)
-                # 只保留基本信息，去除详细的响应内容
-                if isinstance(data, dict):
-                    data.pop("response_body", None)
-                    if "data" in data and isinstance(data["data"], list):
-                        for item in data["data"]:
-                            item.pop("response_body", None)
-                return data
-            except Exception:
-                return None
-
+    def get_response_body(self, body: bytes, truncated: bool) -> Any:
+        if truncated:
+            # 截断的内容不是完整的JSON, 按文本记录
+            return body.decode("utf-8", errors="replace")
         return self.lenient_json(body)
 
     def lenient_json(self, v: Any) -> Any:
@@ -131,63 +193,107 @@ class HttpAuditLogMiddleware(BaseHTTPMiddleware):
                 return json.loads(v)
             except (ValueError, TypeError):
                 pass
+        if isinstance(v, bytes):
+            # 非JSON响应按文本记录, 保证记录可以写入JSONField
+            return v.decode("utf-8", errors="replace")
         return v
 
-    async def _async_iter(self, items: list[bytes]) -> AsyncGenerator[bytes, None]:
-        for item in items:
-            yield item
+    def get_token_claims(self, token: Optional[str]) -> dict:
+        """只校验签名读取claims, 不查询会话存储和数据库"""
+        if not token:
+            return {}
+        try:
+            return jwt.decode(
+                token, settings.SECRET_KEY, algorithms=settings.JWT_ALGORITHM, options={"verify_exp": False}
+            )
+        except jwt.PyJWTError:
+            return {}
 
-    async def get_request_log(self, request: Request, response: Response) -> dict:
+    async def get_request_log(self, request: Request, status: int) -> dict:
         """
-        根据request和response对象获取对应的日志记录数据
+        根据request对象和响应状态码获取对应的日志记录数据
         """
-        data: dict = {"path": request.url.path, "status": response.status_code, "method": request.method}
+        data: dict = {"path": request.url.path, "status": status, "method": request.method}
         # 路由信息
-        app: FastAPI = request.app
-        for route in app.routes:
-            if (
-                isinstance(route, APIRoute)
-                and route.path_regex.match(request.url.path)
-                and request.method in route.methods
-            ):
-                data["module"] = ",".join(route.tags)
-                data["summary"] = route.summary
-        # 获取用户信息
-        try:
-            token = request.headers.get("token")
-            user_obj = None
-            if token:
-                user_obj: User = await AuthControl.is_authed(token)
-            data["user_id"] = user_obj.id if user_obj else 0
-            data["username"] = user_obj.username if user_obj else ""
-        except Exception:
-            data["user_id"] = 0
-            data["username"] = ""
+        meta = route_index.lookup(request.scope)
+        if meta is not None:
+            data["module"], data["summary"] = meta.module, meta.summary
+        # 获取用户信息: 优先使用认证依赖保存的用户, 未经认证的接口只解析token中的claims
+        user = getattr(request.state, "authed_user", None)
+        if user is not None:
+            data["user_id"] = user.id
+            data["username"] = user.username
+        else:
+            claims = self.get_token_claims(request.headers.get("token"))
+            data["user_id"] = claims.get("user_id", 0)
+            data["username"] = claims.get("username", "")
         return data
 
-    async def before_request(self, request: Request):
-        request_args = await self.get_request_args(request)
-        request.state.request_args = request_args
-
-    async def after_request(self, request: Request, response: Response, process_time: int):
-        if request.method in self.methods:
-            for path in self.exclude_paths:
-                if re.search(path, request.url.path, re.I) is not None:
-                    return
-            data: dict = await self.get_request_log(request=request, response=response)
-            data["response_time"] = process_time
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.should_audit(scope):
+            await self.app(scope, receive, send)
+            return
 
-            data["request_args"] = request.state.request_args
-            data["response_body"] = await self.get_response_body(request, response)
-            await AuditLog.create(**data)
+        start_time = time.perf_counter()
+        request_capture: Optional[BodyCapture] = None
+        response_capture: Optional[BodyCapture] = None
+        policy: Optional[AuditPolicy] = None
+        status = 500
+
+        def resolve_policy() -> AuditPolicy:
+            # 路由匹配后 scope["route"] 才可用, 在第一次读取请求体或发送响应时解析
+            nonlocal policy, request_capture
+            if policy is None:
+                meta = route_index.lookup(scope)
+                policy = (meta.policy if meta is not None else audit_policies.for_path(scope["path"])).sample()
+                if policy.capture_body:
+                    limit = policy.request_body_limit(self.max_body_size, self.errors_body_size)
+                    request_capture = BodyCapture(limit, get_content_length(Headers(scope=scope)))
+            return policy
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and resolve_policy().capture_body:
+                request_capture.write(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_capture, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # errors 策略在这里才知道是否失败, 成功的响应不捕获
+                if resolve_policy().capture_response(status):
+                    headers = Headers(raw=message.get("headers", []))
+                    response_capture = BodyCapture(self.max_body_size, get_content_length(headers))
+            elif message["type"] == "http.response.body" and response_capture is not None:
+                response_capture.write(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive_wrapper, send_wrapper)
+        process_time = int((time.perf_counter() - start_time) * 1000)
+        if not resolve_policy().should_record(status):
+            return
 
-        return response
+        if not policy.capture_body:
+            # metadata 策略只记录路由、用户、状态码和耗时
+            data: dict = await self.get_request_log(request=Request(scope), status=status)
+            data["response_time"] = process_time
+            await audit_sink.submit(data)
+            return
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        start_time: datetime = datetime.now()
-        await self.before_request(request)
-        response = await call_next(request)
-        end_time: datetime = datetime.now()
-        process_time = int((end_time.timestamp() - start_time.timestamp()) * 1000)
-        await self.after_request(request, response, process_time)
-        return response
+        # 响应已发送完毕, 用捕获到的请求体重新构造request解析请求参数
+        # 请求体被截断时无法解析, 只记录查询参数
+        request_body = b"" if request_capture.truncated else request_capture.getvalue()
+
+        async def replay_receive() -> Message:
+            return {"type": "http.request", "body": request_body, "more_body": False}
+
+        request = Request(scope, receive=replay_receive)
+        response_capture = response_capture or BodyCapture(0)
+        data = await self.get_request_log(request=request, status=status)
+        data["response_time"] = process_time
+        data["request_args"] = await self.get_request_args(request)
+        data["response_body"] = self.get_response_body(response_capture.getvalue(), response_capture.truncated)
+        data["request_truncated"] = request_capture.truncated
+        data["response_truncated"] = response_capture.truncated
+        await audit_sink.submit(data)
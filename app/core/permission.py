@@ -0,0 +1,156 @@
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+
+from app.models.admin import Api, Role
+from app.settings.config import settings
+from app.utils.cache import TTLCache
+
+Grant = Tuple[str, str]
+
+
+class _RouteNode:
+    __slots__ = ("children", "param", "template")
+
+    def __init__(self):
+        self.children: Dict[str, "_RouteNode"] = {}
+        self.param: Optional["_RouteNode"] = None
+        self.template: Optional[str] = None
+
+
+class RouteTrie:
+    """
+    按请求方法划分的路径模板前缀树(radix)
+    /api/v1/gitlab/projects/{project_id}/tags 这类模板按路径段插入, 参数段共用一个节点,
+    匹配代价与路径长度成正比, 与注册的API数量无关; 静态段优先于参数段
+    """
+
+    def __init__(self):
+        self._roots: Dict[str, _RouteNode] = {}
+
+    @staticmethod
+    def _split(path: str) -> list[str]:
+        return path.strip("/").split("/")
+
+    def insert(self, method: str, template: str) -> None:
+        node = self._roots.setdefault(method, _RouteNode())
+        for segment in self._split(template):
+            if segment.startswith("{") and segment.endswith("}"):
+                if node.param is None:
+                    node.param = _RouteNode()
+                node = node.param
+            else:
+                node = node.children.setdefault(segment, _RouteNode())
+        node.template = template
+
+    def match(self, method: str, path: str) -> Optional[str]:
+        root = self._roots.get(method)
+        if root is None:
+            return None
+        return self._match(root, self._split(path), 0)
+
+    def _match(self, node: _RouteNode, segments: list[str], index: int) -> Optional[str]:
+        if index == len(segments):
+            return node.template
+        child = node.children.get(segments[index])
+        if child is not None:
+            template = self._match(child, segments, index + 1)
+            if template is not None:
+                return template
+        if node.param is not None and segments[index]:
+            return self._match(node.param, segments, index + 1)
+        return None
+
+
+class PermissionEngine:
+    """
+    预编译的权限集合
+    每个角色的 (method, path) 授权编译成 frozenset, 并按角色组合缓存并集,
+    热路径上的非超级管理员鉴权不查询数据库, 只做一次集合查找
+    角色授权、用户角色或API变更时主动失效; 多进程部署时其他worker最多在
+    PERMISSION_CACHE_TTL_SECONDS 后重新编译
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._user_roles = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._role_grants = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._grant_unions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._api_index = TTLCache(maxsize=1, ttl=ttl)
+
+    async def get_api_index(self) -> RouteTrie:
+        trie = self._api_index.get("apis")
+        if trie is None:
+            trie = RouteTrie()
+            for method, path in await Api.all().values_list("method", "path"):
+                trie.insert(str(method), path)
+            self._api_index.set("apis", trie)
+        return trie
+
+    async def resolve_path(self, request: Request) -> str:
+        """
+        将请求解析为路由模板, 与 Api.path (route.path_format) 对齐
+        优先使用路由匹配后写入scope的route, 否则回退到Api表的前缀树索引
+        """
+        route = request.scope.get("route")
+        if isinstance(route, APIRoute):
+            return route.path_format
+        path = request.url.path
+        trie = await self.get_api_index()
+        return trie.match(request.method, path) or path
+
+    async def get_user_role_ids(self, user_id: int) -> FrozenSet[int]:
+        role_ids = self._user_roles.get(user_id)
+        if role_ids is None:
+            role_ids = frozenset(await Role.filter(user_roles__id=user_id).values_list("id", flat=True))
+            self._user_roles.set(user_id, role_ids)
+        return role_ids
+
+    async def get_grants(self, role_ids: FrozenSet[int]) -> FrozenSet[Grant]:
+        grants = self._grant_unions.get(role_ids)
+        if grants is None:
+            grants = await self._compile_roles(role_ids)
+            self._grant_unions.set(role_ids, grants)
+        return grants
+
+    async def _compile_roles(self, role_ids: Iterable[int]) -> FrozenSet[Grant]:
+        role_grants = {}
+        missing = []
+        for role_id in role_ids:
+            grants = self._role_grants.get(role_id)
+            if grants is None:
+                missing.append(role_id)
+            else:
+                role_grants[role_id] = grants
+
+        if missing:
+            compiled = {role_id: set() for role_id in missing}
+            rows = await Api.filter(role_apis__id__in=missing).values_list("role_apis__id", "method", "path")
+            for role_id, method, path in rows:
+                compiled[role_id].add((str(method), path))
+            for role_id, grants in compiled.items():
+                role_grants[role_id] = frozenset(grants)
+                self._role_grants.set(role_id, role_grants[role_id])
+
+        return frozenset().union(*role_grants.values())
+
+    def invalidate_user(self, user_id: int) -> None:
+        self._user_roles.pop(user_id)
+
+    def invalidate_role(self, role_id: int) -> None:
+        self._role_grants.pop(role_id)
+        for role_ids, _ in list(self._grant_unions.items()):
+            if role_id in role_ids:
+                self._grant_unions.pop(role_ids)
+
+    def invalidate_all(self) -> None:
+        self._api_index.clear()
+        self._user_roles.clear()
+        self._role_grants.clear()
+        self._grant_unions.clear()
+
+
+permission_engine = PermissionEngine(
+    maxsize=settings.PERMISSION_CACHE_MAXSIZE,
+    ttl=settings.PERMISSION_CACHE_TTL_SECONDS,
+)
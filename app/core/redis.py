@@ -1,8 +1,112 @@
+import asyncio
+import functools
+import time
+
 import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app.core.exceptions import SessionStoreUnavailable
+from app.log import logger
 from app.settings.config import settings
 
 # Redis连接实例
 redis_client: redis.Redis = None
+_init_lock = asyncio.Lock()
+
+
+class CircuitBreaker:
+    """
+    Redis熔断器
+    连续失败 failure_threshold 次后打开, 打开期间直接抛出 SessionStoreUnavailable 而不占用连接;
+    reset_timeout 秒后进入半开状态, 放行一个探测请求, 成功则关闭, 失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.total_failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Redis circuit breaker opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    async def call(self, func, *args, **kwargs):
+        if not self.allow():
+            self.total_rejected += 1
+            raise SessionStoreUnavailable("Redis circuit breaker is open")
+        probe = self.state == self.HALF_OPEN
+        try:
+            result = await func(*args, **kwargs)
+        except (RedisConnectionError, RedisTimeoutError, asyncio.TimeoutError) as e:
+            self.record_failure()
+            raise SessionStoreUnavailable(repr(e)) from e
+        except Exception:
+            # 命令错误(如ResponseError)说明Redis可以正常响应, 按成功处理
+            self.record_success()
+            raise
+        finally:
+            # 探测被取消(如客户端断开)时不改变状态, 但要允许下一个探测请求
+            if probe:
+                self._probing = False
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+        }
+
+
+redis_breaker = CircuitBreaker(
+    failure_threshold=settings.REDIS_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.REDIS_CIRCUIT_RESET_SECONDS,
+)
+
+
+def circuit_breaker(func):
+    """Redis操作经过熔断器执行"""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await redis_breaker.call(func, *args, **kwargs)
+
+    return wrapper
 
 
 async def init_redis():
@@ -17,19 +121,50 @@ async def init_redis():
     else:
         redis_url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
 
-    redis_client = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+    # 连接数有上限, 连接池耗尽时最多等待 REDIS_POOL_TIMEOUT 秒, 而不是无限创建新连接
+    pool = redis.BlockingConnectionPool.from_url(
+        redis_url,
+        encoding="utf-8",
+        decode_responses=True,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        retry=Retry(ExponentialBackoff(cap=0.5, base=0.05), settings.REDIS_RETRY_ATTEMPTS),
+        retry_on_error=[RedisConnectionError, RedisTimeoutError],
+    )
+    redis_client = redis.Redis(connection_pool=pool)
 
 
 async def close_redis():
     """关闭Redis连接"""
     global redis_client
     if redis_client:
-        await redis_client.close()
+        await redis_client.aclose()
+        await redis_client.connection_pool.disconnect()
+        redis_client = None
 
 
 async def get_redis():
     """获取Redis客户端实例"""
-    global redis_client
     if not redis_client:
-        await init_redis()
+        async with _init_lock:
+            if not redis_client:
+                await init_redis()
     return redis_client
+
+
+def get_redis_pool_stats() -> dict:
+    """Redis连接池指标"""
+    stats = {"initialized": redis_client is not None, "circuit_breaker": redis_breaker.stats()}
+    if redis_client is not None:
+        pool = redis_client.connection_pool
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        available = len([c for c in getattr(pool, "_available_connections", ()) if c is not None])
+        stats.update(
+            max_connections=pool.max_connections,
+            in_use_connections=in_use,
+            idle_connections=available,
+        )
+    return stats
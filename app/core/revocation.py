@@ -0,0 +1,59 @@
+import time
+from typing import Dict, Optional
+
+from app.core.session_store import get_session_store
+from app.settings.config import settings
+
+
+class RevocationFilter:
+    """
+    无状态JWT校验模式下的进程内撤销过滤器
+    会话存储中维护一个按时间排序的撤销日志(单个token摘要或用户token版本号),
+    每个worker的调度器每隔 interval 秒增量同步一次, 因此登出/修改密码最多延迟 interval 秒在本进程生效
+    日志只保留 retention 秒(不短于refresh token有效期), 更早撤销的token已经自然过期
+    """
+
+    def __init__(self, interval: float, retention: float):
+        self.interval = interval
+        self.retention = retention
+        self._revoked_tokens: Dict[str, float] = {}
+        self._user_versions: Dict[int, int] = {}
+        self._watermark: float = 0
+        self._synced_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        """最近一次同步在3个周期内才认为可用, 否则调用方应回退到会话存储校验"""
+        return self._synced_at is not None and time.monotonic() - self._synced_at < self.interval * 3
+
+    def is_revoked(self, token_hash: str, user_id: int, token_version: int) -> bool:
+        if token_hash in self._revoked_tokens:
+            return True
+        return token_version < self._user_versions.get(user_id, 0)
+
+    def apply(self, member: str, timestamp: float) -> None:
+        kind, _, value = member.partition(":")
+        if kind == "token":
+            self._revoked_tokens[value] = timestamp
+        elif kind == "user":
+            user_id, _, version = value.partition(":")
+            user_id, version = int(user_id), int(version)
+            if version > self._user_versions.get(user_id, 0):
+                self._user_versions[user_id] = version
+
+    async def sync(self) -> None:
+        now = time.time()
+        # 与上次同步有一个周期的重叠, 容忍各进程之间的时钟偏差, 重复应用是幂等的
+        since = max(self._watermark - self.interval, now - self.retention)
+        for member, timestamp in await get_session_store().get_revocations_since(since):
+            self.apply(member, timestamp)
+            self._watermark = max(self._watermark, timestamp)
+        for token_hash in [h for h, ts in self._revoked_tokens.items() if ts < now - self.retention]:
+            del self._revoked_tokens[token_hash]
+        self._synced_at = time.monotonic()
+
+
+revocation_filter = RevocationFilter(
+    interval=settings.REVOCATION_SYNC_INTERVAL_SECONDS,
+    retention=settings.JWT_REFRESH_TOKEN_EXPIRE_MINUTES * 60,
+)
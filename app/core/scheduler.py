@@ -0,0 +1,148 @@
+import asyncio
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.session_store import get_session_store
+from app.log import logger
+
+
+class PeriodicJob:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        interval: float,
+        jitter: float = 0.1,
+        leader_only: bool = True,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.leader_only = leader_only
+        self.running: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+
+    @property
+    def lock_key(self) -> str:
+        return f"scheduler:lock:{self.name}"
+
+    @property
+    def lock_ttl(self) -> float:
+        """锁的有效期不超过最短执行间隔, 每个周期只有一个实例抢到锁"""
+        return self.interval * (1 - self.jitter)
+
+    def next_delay(self) -> float:
+        """加入随机抖动, 避免多个worker在同一时刻争抢"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Scheduler:
+    """
+    基于asyncio的周期任务调度器, 由 lifespan 启动和停止
+    - 抖动: 每次执行间隔在 interval * (1 ± jitter) 之间
+    - 防重叠: 上一次执行未结束时跳过本次
+    - 选主: leader_only 的任务执行前在会话存储中抢占一个有效期为 lock_ttl 的锁,
+      多个worker/节点中每个周期只有抢到锁的一个执行
+    - 续期: 执行期间每 lock_ttl/3 秒续期一次, 执行时间超过 lock_ttl 时其他实例也抢不到锁;
+      结束时如果已超过一个周期则释放锁(只释放自己持有的), 否则保留到过期, 维持每周期一次的频率
+    """
+
+    def __init__(self):
+        self.instance_id = uuid.uuid4().hex
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        interval: float,
+        jitter: float = 0.1,
+        leader_only: bool = True,
+    ) -> PeriodicJob:
+        job = PeriodicJob(name, func, interval, jitter=jitter, leader_only=leader_only)
+        self.jobs[name] = job
+        return job
+
+    async def _is_leader(self, job: PeriodicJob) -> bool:
+        try:
+            return await get_session_store().acquire_lock(job.lock_key, self.instance_id, ttl=job.lock_ttl)
+        except Exception as e:
+            logger.warning(f"Scheduler failed to acquire lock for {job.name}: {repr(e)}")
+            return False
+
+    async def _renew_lock(self, job: PeriodicJob) -> None:
+        while True:
+            await asyncio.sleep(job.lock_ttl / 3)
+            try:
+                renewed = await get_session_store().extend_lock(job.lock_key, self.instance_id, ttl=job.lock_ttl)
+            except Exception as e:
+                logger.warning(f"Scheduler failed to renew lock for {job.name}: {repr(e)}")
+                continue
+            if not renewed:
+                logger.warning(f"Scheduler lost the lock for {job.name} while it was still running")
+                return
+
+    async def _release_lock(self, job: PeriodicJob, elapsed: float) -> None:
+        if elapsed < job.lock_ttl:
+            # 锁在本周期结束时自然过期, 提前释放会让其他实例在同一周期内重复执行
+            return
+        try:
+            await get_session_store().release_lock(job.lock_key, self.instance_id)
+        except Exception as e:
+            logger.warning(f"Scheduler failed to release lock for {job.name}: {repr(e)}")
+
+    async def _execute(self, job: PeriodicJob) -> None:
+        renewer = asyncio.create_task(self._renew_lock(job)) if job.leader_only else None
+        started = time.monotonic()
+        try:
+            await job.func()
+            job.runs += 1
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"Scheduled job {job.name} failed: {repr(e)}")
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+                await self._release_lock(job, time.monotonic() - started)
+
+    async def run_once(self, job: PeriodicJob) -> None:
+        if job.running is not None and not job.running.done():
+            job.skipped += 1
+            logger.debug(f"Scheduled job {job.name} is still running, skipped")
+            return
+        if job.leader_only and not await self._is_leader(job):
+            return
+        logger.debug(f"Running scheduled job {job.name}")
+        job.running = asyncio.create_task(self._execute(job))
+
+    async def _loop(self, job: PeriodicJob) -> None:
+        while True:
+            await asyncio.sleep(job.next_delay())
+            await self.run_once(job)
+
+    async def start(self) -> None:
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+
+    async def stop(self) -> None:
+        tasks = self._tasks + [job.running for job in self.jobs.values() if job.running is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self.jobs.clear()
+
+    def stats(self) -> dict:
+        return {
+            name: {"interval": job.interval, "runs": job.runs, "skipped": job.skipped, "failures": job.failures}
+            for name, job in self.jobs.items()
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,305 @@
+import fnmatch
+import heapq
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from app.core.redis import circuit_breaker, close_redis, get_redis, init_redis
+from app.settings.config import settings
+
+# (key, value, ttl秒)
+Record = Tuple[str, str, float]
+
+
+class SessionStore(ABC):
+    """
+    会话存储接口, token_utils 只通过该接口读写token
+    redis: 多进程/多节点部署; memory: 单节点部署、测试和基准测试, 无需Redis服务
+    """
+
+    async def init(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """读取key的值, 不存在或已过期返回None"""
+
+    @abstractmethod
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[str], Optional[float]]:
+        """读取key的值及剩余过期时间(秒)"""
+
+    @abstractmethod
+    async def set_many(self, records: Iterable[Record]) -> None:
+        """原子地写入多个带过期时间的key"""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> int:
+        """删除key, 返回删除的数量"""
+
+    @abstractmethod
+    async def get_int(self, key: str) -> int:
+        """读取计数器, 不存在时为0"""
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """计数器加一并返回新值"""
+
+    @abstractmethod
+    async def log_revocation(self, member: str, timestamp: float, retention: float) -> None:
+        """记录一条撤销事件, 并清理早于 retention 秒的事件"""
+
+    @abstractmethod
+    async def get_revocations_since(self, since: float) -> list[Tuple[str, float]]:
+        """读取时间戳大于等于 since 的撤销事件"""
+
+    @abstractmethod
+    async def acquire_lock(self, key: str, owner: str, ttl: float) -> bool:
+        """抢占一个ttl秒后自动释放的锁, 成功返回True"""
+
+    @abstractmethod
+    async def extend_lock(self, key: str, owner: str, ttl: float) -> bool:
+        """锁仍由owner持有时把有效期重置为ttl秒, 成功返回True"""
+
+    @abstractmethod
+    async def release_lock(self, key: str, owner: str) -> bool:
+        """锁仍由owner持有时释放, 成功返回True"""
+
+    @abstractmethod
+    def scan_iter(self, match: str, count: int = 500) -> AsyncIterator[str]:
+        """增量遍历匹配的key"""
+
+
+class RedisSessionStore(SessionStore):
+    """Redis会话存储, 所有命令经过熔断器, Redis故障时快速抛出 SessionStoreUnavailable"""
+
+    REVOCATION_LOG_KEY = "token_revocations"
+    # 检查持有者和续期/删除需要原子执行, 避免操作到已过期后被其他实例抢占的锁
+    EXTEND_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    async def init(self) -> None:
+        await init_redis()
+
+    async def close(self) -> None:
+        await close_redis()
+
+    @circuit_breaker
+    async def get(self, key: str) -> Optional[str]:
+        redis_client = await get_redis()
+        return await redis_client.get(key)
+
+    @circuit_breaker
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[str], Optional[float]]:
+        redis_client = await get_redis()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            value, ttl = await pipe.get(key).pttl(key).execute()
+        if value is None or ttl is None or ttl < 0:
+            return value, None
+        return value, ttl / 1000
+
+    @circuit_breaker
+    async def set_many(self, records: Iterable[Record]) -> None:
+        redis_client = await get_redis()
+        # 在一个MULTI/EXEC事务中写入, 一次往返, 不会留下部分写入的孤立key
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for key, value, ttl in records:
+                pipe.psetex(key, int(ttl * 1000), value)
+            await pipe.execute()
+
+    @circuit_breaker
+    async def delete(self, *keys: str) -> int:
+        redis_client = await get_redis()
+        return await redis_client.delete(*keys)
+
+    @circuit_breaker
+    async def get_int(self, key: str) -> int:
+        redis_client = await get_redis()
+        return int(await redis_client.get(key) or 0)
+
+    @circuit_breaker
+    async def incr(self, key: str) -> int:
+        redis_client = await get_redis()
+        return await redis_client.incr(key)
+
+    @circuit_breaker
+    async def log_revocation(self, member: str, timestamp: float, retention: float) -> None:
+        redis_client = await get_redis()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.REVOCATION_LOG_KEY, {member: timestamp})
+            pipe.zremrangebyscore(self.REVOCATION_LOG_KEY, "-inf", timestamp - retention)
+            await pipe.execute()
+
+    @circuit_breaker
+    async def get_revocations_since(self, since: float) -> list[Tuple[str, float]]:
+        redis_client = await get_redis()
+        return await redis_client.zrangebyscore(self.REVOCATION_LOG_KEY, since, "+inf", withscores=True)
+
+    @circuit_breaker
+    async def acquire_lock(self, key: str, owner: str, ttl: float) -> bool:
+        redis_client = await get_redis()
+        return bool(await redis_client.set(key, owner, nx=True, px=max(int(ttl * 1000), 1)))
+
+    @circuit_breaker
+    async def extend_lock(self, key: str, owner: str, ttl: float) -> bool:
+        redis_client = await get_redis()
+        return bool(await redis_client.eval(self.EXTEND_LOCK_SCRIPT, 1, key, owner, max(int(ttl * 1000), 1)))
+
+    @circuit_breaker
+    async def release_lock(self, key: str, owner: str) -> bool:
+        redis_client = await get_redis()
+        return bool(await redis_client.eval(self.RELEASE_LOCK_SCRIPT, 1, key, owner))
+
+    async def scan_iter(self, match: str, count: int = 500) -> AsyncIterator[str]:
+        redis_client = await get_redis()
+        async for key in redis_client.scan_iter(match=match, count=count):
+            yield key
+
+
+class MemorySessionStore(SessionStore):
+    """进程内会话存储, 按TTL淘汰; 过期key在访问时或写入时按过期时间顺序清理"""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[str, float]] = {}
+        self._counters: Dict[str, int] = {}
+        self._revocations: Dict[str, float] = {}
+        self._expiry_heap: list[Tuple[float, str]] = []
+
+    @staticmethod
+    def _now() -> float:
+        return time.monotonic()
+
+    def _evict_expired(self) -> None:
+        now = self._now()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, key = heapq.heappop(self._expiry_heap)
+            item = self._values.get(key)
+            if item is not None and item[1] <= now:
+                del self._values[key]
+
+    def _get_value(self, key: str) -> Optional[Tuple[str, float]]:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        if item[1] <= self._now():
+            del self._values[key]
+            return None
+        return item
+
+    async def close(self) -> None:
+        self._values.clear()
+        self._counters.clear()
+        self._revocations.clear()
+        self._expiry_heap.clear()
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._get_value(key)
+        return item[0] if item else None
+
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[str], Optional[float]]:
+        item = self._get_value(key)
+        if item is None:
+            return None, None
+        return item[0], item[1] - self._now()
+
+    async def set_many(self, records: Iterable[Record]) -> None:
+        self._evict_expired()
+        now = self._now()
+        for key, value, ttl in records:
+            expires_at = now + ttl
+            self._values[key] = (value, expires_at)
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+
+    async def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._get_value(key) is not None:
+                deleted += 1
+            self._values.pop(key, None)
+            if self._counters.pop(key, None) is not None:
+                deleted += 1
+        return deleted
+
+    async def get_int(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def log_revocation(self, member: str, timestamp: float, retention: float) -> None:
+        self._revocations[member] = timestamp
+        for expired in [m for m, ts in self._revocations.items() if ts < timestamp - retention]:
+            del self._revocations[expired]
+
+    async def get_revocations_since(self, since: float) -> list[Tuple[str, float]]:
+        return sorted(((m, ts) for m, ts in self._revocations.items() if ts >= since), key=lambda item: item[1])
+
+    async def acquire_lock(self, key: str, owner: str, ttl: float) -> bool:
+        if self._get_value(key) is not None:
+            return False
+        await self.set_many([(key, owner, ttl)])
+        return True
+
+    async def extend_lock(self, key: str, owner: str, ttl: float) -> bool:
+        item = self._get_value(key)
+        if item is None or item[0] != owner:
+            return False
+        await self.set_many([(key, owner, ttl)])
+        return True
+
+    async def release_lock(self, key: str, owner: str) -> bool:
+        item = self._get_value(key)
+        if item is None or item[0] != owner:
+            return False
+        del self._values[key]
+        return True
+
+    async def scan_iter(self, match: str, count: int = 500) -> AsyncIterator[str]:
+        for key in list(self._values):
+            if fnmatch.fnmatchcase(key, match) and self._get_value(key) is not None:
+                yield key
+
+
+SESSION_STORE_BACKENDS = {
+    "redis": RedisSessionStore,
+    "memory": MemorySessionStore,
+}
+
+session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """获取会话存储实例, 后端由 SESSION_STORE_BACKEND 配置"""
+    global session_store
+    if session_store is None:
+        backend = settings.SESSION_STORE_BACKEND
+        if backend not in SESSION_STORE_BACKENDS:
+            raise ValueError(f"Unknown session store backend: {backend}")
+        session_store = SESSION_STORE_BACKENDS[backend]()
+    return session_store
+
+
+async def init_session_store():
+    """初始化会话存储"""
+    await get_session_store().init()
+
+
+async def close_session_store():
+    """关闭会话存储"""
+    global session_store
+    if session_store:
+        await session_store.close()
+        session_store = None
@@ -1,9 +1,13 @@
+from datetime import datetime
+
 from tortoise import fields
 
 from app.schemas.menus import MenuType
+from app.settings import settings
 
 from .base import BaseModel, TimestampMixin
 from .enums import MethodType
+from .fields import CompressedJSONField
 
 
 class User(BaseModel, TimestampMixin):
@@ -86,6 +90,15 @@ class RefreshToken(BaseModel, TimestampMixin):
         table = "refresh_token"
 
 
+def month_key(dt: datetime) -> int:
+    """审计日志的归档键: 年月, 如 202401"""
+    return dt.year * 100 + dt.month
+
+
+def current_month() -> int:
+    return month_key(datetime.now())
+
+
 class AuditLog(BaseModel, TimestampMixin):
     user_id = fields.IntField(description="用户ID", index=True)
     username = fields.CharField(max_length=64, default="", description="用户名称", index=True)
@@ -95,5 +108,47 @@ class AuditLog(BaseModel, TimestampMixin):
     path = fields.CharField(max_length=255, default="", description="请求路径", index=True)
     status = fields.IntField(default=-1, description="状态码", index=True)
     response_time = fields.IntField(default=0, description="响应时间(单位ms)", index=True)
-    request_args = fields.JSONField(null=True, description="请求参数")
-    response_body = fields.JSONField(null=True, description="返回数据")
+    request_args = CompressedJSONField(
+        codec=settings.AUDIT_PAYLOAD_CODEC,
+        threshold=settings.AUDIT_PAYLOAD_COMPRESS_THRESHOLD,
+        null=True,
+        description="请求参数",
+    )
+    response_body = CompressedJSONField(
+        codec=settings.AUDIT_PAYLOAD_CODEC,
+        threshold=settings.AUDIT_PAYLOAD_COMPRESS_THRESHOLD,
+        null=True,
+        description="返回数据",
+    )
+    request_truncated = fields.BooleanField(default=False, description="请求体是否被截断(截断时只记录查询参数)")
+    response_truncated = fields.BooleanField(default=False, description="返回数据是否被截断")
+    # 按月保留/归档的键: 过期月份按它整体导出并删除, 不用于查询过滤(按时间查询走 created_at 索引)
+    # 并非数据库分区; 列名沿用 month, 升级前的旧数据由归档任务补齐
+    archive_month = fields.IntField(
+        null=True, default=current_month, source_field="month", description="归档键(年月)", index=True
+    )
+
+
+class AuditLogRollup(BaseModel, TimestampMixin):
+    granularity = fields.CharField(max_length=10, description="汇总粒度(minute/hour)", index=True)
+    bucket = fields.DatetimeField(description="时间桶起始时间", index=True)
+    method = fields.CharField(max_length=10, default="", description="请求方法")
+    path = fields.CharField(max_length=255, default="", description="请求路径", index=True)
+    count = fields.IntField(default=0, description="请求数")
+    error_count = fields.IntField(default=0, description="错误数(状态码>=400)")
+    total_time = fields.BigIntField(default=0, description="响应时间合计(单位ms)")
+    max_time = fields.IntField(default=0, description="最大响应时间(单位ms)")
+    sketch = fields.JSONField(null=True, description="响应时间分布(可合并的对数分桶直方图)")
+
+    class Meta:
+        table = "audit_log_rollup"
+        unique_together = (("granularity", "bucket", "method", "path"),)
+
+
+class RollupWatermark(BaseModel):
+    name = fields.CharField(max_length=64, unique=True, description="汇总任务名称")
+    last_id = fields.BigIntField(default=0, description="已汇总的最大审计日志ID")
+    gaps = fields.JSONField(default=dict, description="水位以下尚未出现的ID及首次发现的时间戳")
+
+    class Meta:
+        table = "rollup_watermark"
@@ -14,7 +14,7 @@ class BaseModel(models.Model):
             exclude_fields = []
 
         d = {}
-        for field in self._meta.db_fields:
+        for field in self._meta.fields_db_projection:
             if field not in exclude_fields:
                 value = getattr(self, field)
                 if isinstance(value, datetime):
@@ -0,0 +1,84 @@
+import base64
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tortoise import fields
+
+from app.log import logger
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖, 未安装时只能使用zlib
+    zstandard = None
+
+ENVELOPE_KEY = "__compressed__"
+
+Codec = Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+
+def _zlib_codec(level: int) -> Codec:
+    return (lambda data: zlib.compress(data, level)), zlib.decompress
+
+
+def _zstd_codec(level: int) -> Codec:
+    compressor = zstandard.ZstdCompressor(level=level)
+    decompressor = zstandard.ZstdDecompressor()
+    return compressor.compress, decompressor.decompress
+
+
+CODECS: Dict[str, Callable[[int], Codec]] = {"zlib": _zlib_codec}
+if zstandard is not None:
+    CODECS["zstd"] = _zstd_codec
+
+
+class CompressedJSONField(fields.JSONField):
+    """
+    压缩存储的JSON字段
+    序列化后超过 threshold 字节的值压缩后保存为JSON信封 {"__compressed__": codec, "data": base64},
+    列类型仍为JSON, 无需修改表结构; 读取时自动解压, 未压缩的旧数据原样读取
+    """
+
+    def __init__(self, codec: str = "zlib", threshold: int = 1024, level: int = 6, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        if codec not in CODECS:
+            logger.warning(f"Compression codec {codec} is not available, falling back to zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.threshold = threshold
+        self.level = level
+        self._compress, _ = CODECS[codec](level)
+        self._decompressors: Dict[str, Callable[[bytes], bytes]] = {}
+
+    def _decompressor(self, codec: str) -> Callable[[bytes], bytes]:
+        # 解码时按信封中记录的codec选择, 切换配置后旧数据仍可读取
+        if codec not in self._decompressors:
+            if codec not in CODECS:
+                raise ValueError(f"Compression codec {codec} is not installed")
+            self._decompressors[codec] = CODECS[codec](self.level)[1]
+        return self._decompressors[codec]
+
+    def to_db_value(self, value: Any, instance: Any) -> Optional[str]:
+        self.validate(value)
+        if value is None:
+            return None
+        # 字符串也按JSON值编码, 非JSON的文本响应可以正常保存
+        text = self.encoder(value)
+        raw = text.encode("utf-8")
+        if len(raw) < self.threshold:
+            return text
+        compressed = base64.b64encode(self._compress(raw)).decode("ascii")
+        if len(compressed) >= len(raw):
+            return text
+        return self.encoder({ENVELOPE_KEY: self.codec, "data": compressed})
+
+    def to_python_value(self, value: Any) -> Any:
+        if isinstance(value, (str, bytes)):
+            try:
+                value = self.decoder(value)
+            except ValueError:
+                # 构造模型时传入的非JSON文本
+                return value
+        if isinstance(value, dict) and value.keys() == {ENVELOPE_KEY, "data"}:
+            raw = self._decompressor(value[ENVELOPE_KEY])(base64.b64decode(value["data"]))
+            return self.decoder(raw)
+        return value
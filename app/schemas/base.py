@@ -35,7 +35,7 @@ class SuccessExtra(JSONResponse):
         code: int = 200,
         msg: Optional[str] = None,
         data: Optional[Any] = None,
-        total: int = 0,
+        total: Optional[int] = 0,
         page: int = 1,
         page_size: int = 20,
         **kwargs,
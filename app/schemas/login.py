@@ -18,6 +18,7 @@ class JWTPayload(BaseModel):
     user_id: int
     username: str
     is_superuser: bool
+    token_version: int = 0
     exp: datetime
 
 
@@ -25,6 +26,7 @@ class RefreshTokenPayload(BaseModel):
     user_id: int
     username: str
     is_superuser: bool
+    token_version: int = 0
     exp: datetime
 
 
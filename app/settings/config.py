@@ -31,11 +31,79 @@ class Settings(BaseSettings):
     JWT_REFRESH_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("JWT_REFRESH_TOKEN_EXPIRE_MINUTES", 600))  # 600 minutes
     DB_TYPE: str = os.getenv("DB_TYPE", "sqlite")
 
+    # 认证主体进程内缓存配置
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_MAXSIZE: int = int(os.getenv("AUTH_CACHE_MAXSIZE", 10000))
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+    TOKEN_VERSION_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_VERSION_CACHE_TTL_SECONDS", 5))
+
+    # 无状态JWT校验模式: access token只校验签名和exp, 并查询进程内的撤销过滤器, 不访问会话存储
+    # 登出/修改密码最多延迟 REVOCATION_SYNC_INTERVAL_SECONDS 在各进程生效
+    AUTH_STATELESS: bool = False
+    REVOCATION_SYNC_INTERVAL_SECONDS: int = int(os.getenv("REVOCATION_SYNC_INTERVAL_SECONDS", 5))
+
+    # 权限集合进程内缓存配置
+    PERMISSION_CACHE_MAXSIZE: int = int(os.getenv("PERMISSION_CACHE_MAXSIZE", 10000))
+    PERMISSION_CACHE_TTL_SECONDS: int = int(os.getenv("PERMISSION_CACHE_TTL_SECONDS", 60))
+
+    # 密码哈希执行器: thread 或 process, argon2计算不在事件循环中执行
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 0))  # 0表示不限制排队数
+
+    # 周期任务调度器
+    SCHEDULER_ENABLED: bool = True  # 只控制集群维护任务, 吊销同步、落盘重放等本进程任务始终运行
+    TOKEN_CLEANUP_INTERVAL_SECONDS: int = int(os.getenv("TOKEN_CLEANUP_INTERVAL_SECONDS", 600))
+
+    # 审计日志批量写入
+    AUDIT_QUEUE_MAXSIZE: int = int(os.getenv("AUDIT_QUEUE_MAXSIZE", 10000))  # 队列满时丢弃新记录
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", 200))
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", 1.0))
+    AUDIT_PAYLOAD_CODEC: str = os.getenv("AUDIT_PAYLOAD_CODEC", "zlib")  # zlib / zstd(需安装zstandard)
+    AUDIT_PAYLOAD_COMPRESS_THRESHOLD: int = int(os.getenv("AUDIT_PAYLOAD_COMPRESS_THRESHOLD", 1024))  # 字节
+    # compress_audit_logs 只重写不小于该字节数的记录, 默认与压缩阈值相同(更小的载荷写入后也不会压缩)
+    AUDIT_COMPRESS_MIN_BYTES: int = int(os.getenv("AUDIT_COMPRESS_MIN_BYTES", AUDIT_PAYLOAD_COMPRESS_THRESHOLD))
+    AUDIT_MAX_BODY_SIZE: int = int(os.getenv("AUDIT_MAX_BODY_SIZE", 1024 * 1024))  # 请求体/响应体最多记录的字节数
+    # errors 策略的接口请求体只保留的前缀字节数(请求开始时还不知道是否失败)
+    AUDIT_ERRORS_REQUEST_BODY_SIZE: int = int(os.getenv("AUDIT_ERRORS_REQUEST_BODY_SIZE", 4096))
+    # 数据库不可用或队列已满时审计记录写入本地JSONL段文件, 由重放任务在数据库恢复后批量写回
+    AUDIT_SPOOL_ENABLED: bool = True
+    AUDIT_SPOOL_DIR: str = os.getenv("AUDIT_SPOOL_DIR", os.path.join(BASE_DIR, "data/spool/audit"))
+    AUDIT_SPOOL_SEGMENT_SIZE: int = int(os.getenv("AUDIT_SPOOL_SEGMENT_SIZE", 8 * 1024 * 1024))  # 单个段的字节数
+    AUDIT_SPOOL_FSYNC: bool = True  # 每次追加后fsync, 进程或主机崩溃不丢失已落盘的记录
+    AUDIT_SPOOL_MAX_ATTEMPTS: int = int(os.getenv("AUDIT_SPOOL_MAX_ATTEMPTS", 5))  # 段重放失败超过次数后隔离
+    AUDIT_SPOOL_REPLAY_INTERVAL_SECONDS: int = int(os.getenv("AUDIT_SPOOL_REPLAY_INTERVAL_SECONDS", 30))
+    # 审计策略: always / sampled:<比例> / errors / metadata / never
+    # 规则key为 "tag:<标签>" 时按路由标签匹配, 否则按路径正则匹配; 接口上用 @audit_policy 声明的策略优先
+    AUDIT_DEFAULT_POLICY: str = os.getenv("AUDIT_DEFAULT_POLICY", "always")
+    AUDIT_POLICY_RULES: typing.Dict[str, str] = {}
+    AUDIT_FULLTEXT_ENABLED: bool = True  # 为审计日志的搜索字段建立全文索引(SQLite FTS5 / MySQL ngram)
+    AUDIT_RETENTION_MONTHS: int = int(os.getenv("AUDIT_RETENTION_MONTHS", 0))  # 保留的月数, 0表示不清理
+    AUDIT_RETENTION_INTERVAL_SECONDS: int = int(os.getenv("AUDIT_RETENTION_INTERVAL_SECONDS", 3600))
+    AUDIT_ARCHIVE_ROOT: str = os.getenv("AUDIT_ARCHIVE_ROOT", os.path.join(BASE_DIR, "data/archives"))
+    AUDIT_ROLLUP_INTERVAL_SECONDS: int = int(os.getenv("AUDIT_ROLLUP_INTERVAL_SECONDS", 60))
+    # 水位以下的ID空洞(并发事务或重放晚提交的记录)在该时间内持续补扫, 超时视为不会再出现
+    AUDIT_ROLLUP_GAP_SECONDS: int = int(os.getenv("AUDIT_ROLLUP_GAP_SECONDS", 300))
+    AUDIT_ROLLUP_MINUTE_RETENTION_DAYS: int = int(os.getenv("AUDIT_ROLLUP_MINUTE_RETENTION_DAYS", 7))
+
+    # 会话存储后端: redis 或 memory(进程内, 适用于单节点部署、测试和基准测试)
+    SESSION_STORE_BACKEND: str = os.getenv("SESSION_STORE_BACKEND", "redis")
+
     # Redis配置
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
     REDIS_DB: int = int(os.getenv("REDIS_DB", 8))
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", "")
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+    REDIS_POOL_TIMEOUT: float = float(os.getenv("REDIS_POOL_TIMEOUT", 1.0))  # 等待空闲连接的秒数
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 1.0))  # 命令超时秒数
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 1.0))
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+    REDIS_RETRY_ATTEMPTS: int = int(os.getenv("REDIS_RETRY_ATTEMPTS", 1))
+    REDIS_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("REDIS_CIRCUIT_FAILURE_THRESHOLD", 5))
+    REDIS_CIRCUIT_RESET_SECONDS: int = int(os.getenv("REDIS_CIRCUIT_RESET_SECONDS", 10))
+    # Redis不可用时是否回退为仅校验JWT签名(仍会查询撤销过滤器), 否则返回503
+    REDIS_FALLBACK_SIGNATURE_ONLY: bool = False
 
     # GitLab配置
     GITLAB_URL: str = os.getenv("GITLAB_URL", "https://gitlab.com")
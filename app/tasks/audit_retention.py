@@ -0,0 +1,19 @@
+from app.controllers.auditlog import auditlog_controller
+from app.log import logger
+from app.settings.config import settings
+
+
+async def archive_expired_audit_logs():
+    """
+    Export audit log partitions older than AUDIT_RETENTION_MONTHS to compressed JSONL files and drop them.
+    """
+    try:
+        paths = await auditlog_controller.expire_months(
+            retention_months=settings.AUDIT_RETENTION_MONTHS, directory=settings.AUDIT_ARCHIVE_ROOT
+        )
+        for path in paths:
+            logger.info(f"Archived expired audit logs to {path}")
+        return paths
+    except Exception as e:
+        logger.error(f"Error archiving expired audit logs: {str(e)}")
+        return []
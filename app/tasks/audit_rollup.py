@@ -0,0 +1,17 @@
+from app.controllers.auditlog_rollup import auditlog_rollup_controller
+from app.log import logger
+from app.settings.config import settings
+
+
+async def rollup_audit_logs():
+    """
+    Fold new audit logs into the per-minute and per-hour rollups and prune old minute rollups.
+    """
+    try:
+        processed = await auditlog_rollup_controller.rollup()
+        pruned = await auditlog_rollup_controller.prune(settings.AUDIT_ROLLUP_MINUTE_RETENTION_DAYS)
+        logger.debug(f"Rolled up {processed} audit logs, pruned {pruned} minute rollups")
+        return processed
+    except Exception as e:
+        logger.error(f"Error rolling up audit logs: {str(e)}")
+        return 0
@@ -0,0 +1,16 @@
+from app.core.audit_spool import audit_spool
+from app.log import logger
+
+
+async def replay_audit_spool():
+    """
+    Load audit records spooled to disk while the database was unavailable back into AuditLog.
+    """
+    try:
+        replayed = await audit_spool.replay()
+        if replayed:
+            logger.info(f"Replayed {replayed} spooled audit records")
+        return replayed
+    except Exception as e:
+        logger.warning(f"Audit spool replay failed, will retry later: {str(e)}")
+        return 0
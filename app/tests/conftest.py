@@ -4,10 +4,11 @@ import sys
 from pathlib import Path
 
 import pytest
+import pytest_asyncio
 from dotenv import load_dotenv
 
 # Add the project root to the Python path
-project_root = Path(__file__).parent.parent
+project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 # Load environment variables
@@ -17,7 +18,7 @@ if env_path.exists():
 
 # Initialize the app for testing
 from app import create_app
-from app.core.redis import init_redis, close_redis
+from app.core.session_store import close_session_store, init_session_store
 
 
 @pytest.fixture(scope="session")
@@ -31,8 +32,8 @@ def event_loop():
 @pytest.fixture(scope="session")
 async def app():
     """Create and configure a new app instance for each test session."""
-    # Initialize Redis
-    await init_redis()
+    # Initialize the session store (in-memory backend in .env-test)
+    await init_session_store()
 
     # Create the app
     app = create_app()
@@ -40,7 +41,7 @@ async def app():
     yield app
 
     # Clean up
-    await close_redis()
+    await close_session_store()
 
 
 @pytest.fixture(scope="session")
@@ -50,3 +51,14 @@ async def client(app):
 
     async with AsyncClient(app=app, base_url="http://testserver") as client:
         yield client
+
+
+@pytest_asyncio.fixture
+async def db():
+    """In-memory SQLite database with the app models, for tests that need real queries."""
+    from tortoise import Tortoise
+
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+    await Tortoise.generate_schemas()
+    yield
+    await Tortoise.close_connections()
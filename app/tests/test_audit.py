@@ -0,0 +1,136 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core.audit import AuditSink
+from app.core.audit_spool import AuditSpool
+from app.models.admin import AuditLog
+
+
+def make_record(i: int) -> dict:
+    return {"user_id": 1, "username": "admin", "method": "GET", "path": f"/api/v1/item/{i}", "status": 200}
+
+
+@pytest.mark.asyncio
+class TestAuditSink:
+    """Test cases for the batched AuditSink"""
+
+    async def test_batches_records_and_flushes_on_stop(self):
+        """Test queued records are written with bulk_create in batches, including on shutdown"""
+        sink = AuditSink(maxsize=100, batch_size=10, flush_interval=60)
+        mock_bulk_create = AsyncMock()
+
+        with patch("app.core.audit.AuditLog.bulk_create", mock_bulk_create):
+            await sink.start()
+            for i in range(25):
+                assert await sink.submit(make_record(i))
+            await sink.stop()
+
+        written = [len(call.args[0]) for call in mock_bulk_create.await_args_list]
+        assert sum(written) == 25
+        assert max(written) <= 10
+        assert sink.stats()["written"] == 25
+
+    async def test_drops_records_when_queue_is_full(self):
+        """Test a full queue drops new records and counts them instead of blocking"""
+        sink = AuditSink(maxsize=2, batch_size=10, flush_interval=60)
+        mock_bulk_create = AsyncMock()
+
+        with patch("app.core.audit.AuditLog.bulk_create", mock_bulk_create):
+            await sink.start()
+            results = [await sink.submit(make_record(i)) for i in range(5)]
+            await sink.stop()
+
+        assert results.count(False) == 3
+        assert sink.stats()["dropped"] == 3
+        assert sink.stats()["written"] == 2
+
+
+@pytest.mark.asyncio
+class TestAuditSpool:
+    """Test cases for the on-disk AuditSpool fallback"""
+
+    async def test_failed_batches_are_spooled_and_replayed(self, db, tmp_path):
+        """Test records that fail to write are spooled to disk and loaded into AuditLog once the DB recovers"""
+        spool = AuditSpool(directory=str(tmp_path), segment_size=1024 * 1024, fsync=False)
+        sink = AuditSink(maxsize=100, batch_size=10, flush_interval=60, spool=spool)
+
+        with patch("app.core.audit.AuditLog.bulk_create", AsyncMock(side_effect=ConnectionError("db down"))):
+            await sink.start()
+            for i in range(5):
+                await sink.submit(make_record(i))
+            await sink.stop()
+
+        assert sink.stats()["failed"] == 0
+        assert spool.stats()["spooled"] == 5
+        assert len(spool.sealed_segments()) == 1
+        assert await AuditLog.all().count() == 0
+
+        assert await spool.replay() == 5
+        assert spool.sealed_segments() == []
+        paths = sorted(await AuditLog.all().values_list("path", flat=True))
+        assert paths == [f"/api/v1/item/{i}" for i in range(5)]
+
+    async def test_failed_replay_keeps_segment(self, tmp_path):
+        """Test a segment is kept without counting an attempt when the DB is still unavailable"""
+        spool = AuditSpool(directory=str(tmp_path), segment_size=1024 * 1024, fsync=False)
+        await spool.append([make_record(1)])
+
+        with (
+            patch.object(AuditSpool, "_database_available", AsyncMock(return_value=False)),
+            patch("app.core.audit_spool.in_transaction"),
+            patch("app.core.audit_spool.AuditLog.bulk_create", AsyncMock(side_effect=ConnectionError("db down"))),
+        ):
+            with pytest.raises(ConnectionError):
+                await spool.replay()
+
+        assert [spool.attempts(name) for name in spool.sealed_segments()] == [0]
+
+    async def test_queue_overflow_is_spooled_in_batches(self, tmp_path):
+        """Test records overflowing the queue are spooled by the background task, not inside submit"""
+        spool = AuditSpool(directory=str(tmp_path), segment_size=1024 * 1024, fsync=False)
+        sink = AuditSink(maxsize=2, batch_size=10, flush_interval=60, spool=spool)
+        mock_append = AsyncMock(wraps=spool.append)
+
+        with (
+            patch("app.core.audit.AuditLog.bulk_create", AsyncMock()),
+            patch.object(spool, "append", mock_append),
+        ):
+            await sink.start()
+            results = [await sink.submit(make_record(i)) for i in range(4)]
+            assert mock_append.await_count == 0
+            await sink.stop()
+
+        assert all(results)
+        assert sink.stats()["dropped"] == 0
+        assert mock_append.await_count == 1
+        assert len(mock_append.await_args.args[0]) == 2
+        assert spool.stats()["spooled"] == 2
+
+    async def test_bad_segment_is_quarantined_without_blocking_others(self, db, tmp_path):
+        """Test a segment that keeps failing while the DB is up is skipped, then quarantined after max_attempts"""
+        spool = AuditSpool(directory=str(tmp_path), segment_size=1024 * 1024, fsync=False, max_attempts=2)
+        # 与当前表结构不兼容的记录
+        await spool.append([{**make_record(0), "user_id": None}])
+        spool.rotate()
+        await spool.append([make_record(1)])
+
+        assert await spool.replay() == 1
+        assert [spool.attempts(name) for name in spool.sealed_segments()] == [1]
+        assert await spool.replay() == 0
+        assert spool.sealed_segments() == []
+        assert len(list(tmp_path.glob("*.quarantine"))) == 1
+        assert await AuditLog.all().values_list("path", flat=True) == ["/api/v1/item/1"]
+
+    async def test_rotates_segments_and_recovers_leftovers(self, tmp_path):
+        """Test segments are sealed by size and segments left by a dead process are recovered"""
+        spool = AuditSpool(directory=str(tmp_path), segment_size=50, fsync=False)
+        for i in range(4):
+            await spool.append([make_record(i)])
+        assert len(spool.sealed_segments()) == 4
+
+        # 上次运行遗留的活动段和未完成重放的段
+        (tmp_path / "999999999-1-000001.open").write_text(spool.encode(make_record(9)), encoding="utf-8")
+        (tmp_path / "999999999-2-000001.replay").write_text(spool.encode(make_record(8)), encoding="utf-8")
+        spool.recover()
+        assert len(spool.sealed_segments()) == 6
+        assert not list(tmp_path.glob("*.open")) and not list(tmp_path.glob("*.replay"))
@@ -0,0 +1,139 @@
+import pytest
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+
+from app.controllers.auditlog import auditlog_controller
+from app.models.admin import AuditLog
+
+
+async def create_logs(count: int) -> None:
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    # 每两条记录的 created_at 相同, 验证相同时间时按id稳定排序
+    await AuditLog.bulk_create(
+        [
+            AuditLog(user_id=1, username="admin", path=f"/api/v1/item/{i}", created_at=base + timedelta(seconds=i // 2))
+            for i in range(count)
+        ]
+    )
+
+
+@pytest.mark.asyncio
+class TestAuditLogController:
+    """Test cases for the audit log controller"""
+
+    async def test_cursor_pagination_walks_all_rows_once(self, db):
+        """Test following next_cursor returns every row exactly once, newest first"""
+        await create_logs(25)
+        search = auditlog_controller.build_search(username="adm")
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = await auditlog_controller.list_by_cursor(search, page_size=10, cursor=cursor)
+            seen.extend(row["id"] for row in rows)
+            if cursor is None:
+                break
+
+        expected = await AuditLog.all().order_by("-created_at", "-id").values_list("id", flat=True)
+        assert seen == list(expected)
+        assert len(seen) == 25
+
+    async def test_list_excludes_payload_columns(self, db):
+        """Test list rows only carry summary columns, payloads stay on the detail record"""
+        await AuditLog.create(user_id=1, username="admin", request_args={"a": 1}, response_body={"big": "x" * 1000})
+
+        rows = await auditlog_controller.list_summary(auditlog_controller.build_search(), page=1, page_size=10)
+        assert "request_args" not in rows[0]
+        assert "response_body" not in rows[0]
+        assert isinstance(rows[0]["created_at"], str)
+
+        detail = await (await auditlog_controller.get(id=rows[0]["id"])).to_dict()
+        assert detail["request_args"] == {"a": 1}
+
+    async def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected with 400"""
+        with pytest.raises(HTTPException) as exc_info:
+            auditlog_controller.after_cursor("not-a-cursor")
+        assert exc_info.value.status_code == 400
+
+    async def test_expire_months_archives_and_drops(self, db, tmp_path):
+        """Test expired months are exported to gzip JSONL files and deleted, recent months are kept"""
+        import gzip
+        import json
+
+        now = datetime.now()
+        await AuditLog.create(user_id=1, path="/old", request_args={"a": 1}, created_at=datetime(2020, 5, 1))
+        await AuditLog.filter(path="/old").update(archive_month=None)
+        await AuditLog.create(user_id=1, path="/new", created_at=now)
+
+        paths = await auditlog_controller.expire_months(retention_months=3, directory=str(tmp_path))
+
+        assert [p.rsplit("/", 1)[-1] for p in paths] == ["auditlog-202005.jsonl.gz"]
+        with gzip.open(paths[0], "rt", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert rows[0]["path"] == "/old"
+        assert rows[0]["request_args"] == {"a": 1}
+        assert await AuditLog.all().values_list("path", flat=True) == ["/new"]
+
+        # 归档后写入的迟到记录单独归档, 不覆盖已有的归档文件
+        await AuditLog.create(user_id=1, path="/late", created_at=datetime(2020, 5, 2), archive_month=202005)
+        late_paths = await auditlog_controller.expire_months(retention_months=3, directory=str(tmp_path))
+        assert [p.rsplit("/", 1)[-1] for p in late_paths] == ["auditlog-202005-2.jsonl.gz"]
+        with gzip.open(paths[0], "rt", encoding="utf-8") as f:
+            assert [json.loads(line)["path"] for line in f] == ["/old"]
+        with gzip.open(late_paths[0], "rt", encoding="utf-8") as f:
+            assert [json.loads(line)["path"] for line in f] == ["/late"]
+
+    async def test_fulltext_search_matches_substrings(self, db):
+        """Test text filters use the FTS5 trigram index and stay in sync on insert, update and delete"""
+        await AuditLog.create(user_id=1, username="administrator", path="/api/v1/user/list")
+        try:
+            await auditlog_controller.ensure_fulltext_index()
+            assert auditlog_controller.fulltext == "sqlite"
+            await AuditLog.bulk_create(
+                [
+                    AuditLog(user_id=2, username="bob", path="/api/v1/role/list"),
+                    AuditLog(user_id=3, username='o\'reilly "quoted"', path="/api/v1/user/get"),
+                ]
+            )
+
+            async def search(**terms):
+                q = auditlog_controller.build_search(**terms)
+                assert "_fts" in AuditLog.filter(q).sql() or all(len(t) < 3 for t in terms.values())
+                return sorted(await AuditLog.filter(q).values_list("user_id", flat=True))
+
+            assert await search(username="MINIST") == [1]
+            assert await search(path="/user/") == [1, 3]
+            assert await search(username="bob", path="role") == [2]
+            assert await search(username="'reilly \"q") == [3]
+            assert await search(username="ob") == [2]
+
+            await AuditLog.filter(user_id=2).update(username="robert")
+            await AuditLog.filter(user_id=1).delete()
+            assert await search(username="bert") == [2]
+            assert await search(path="/user/") == [3]
+        finally:
+            auditlog_controller.fulltext = None
+
+    async def test_export_streams_filtered_rows(self, db):
+        """Test exports walk every matching row in keyset batches, as CSV or NDJSON"""
+        import csv
+        import io
+        import json
+
+        await create_logs(7)
+        await AuditLog.create(user_id=2, username="other", path="/api/v1/other", request_args={"k": "v"})
+        search = auditlog_controller.build_search(username="admin")
+
+        ids = [row["id"] async for row in auditlog_controller.iter_rows(search, ["path"], batch_size=3)]
+        expected = await AuditLog.filter(search).order_by("-created_at", "-id").values_list("id", flat=True)
+        assert ids == list(expected)
+
+        csv_text = "".join([chunk async for chunk in auditlog_controller.export(search, fmt="csv")])
+        rows = list(csv.DictReader(io.StringIO(csv_text)))
+        assert len(rows) == 7
+        assert "response_body" not in rows[0]
+
+        search = auditlog_controller.build_search(username="other")
+        lines = [chunk async for chunk in auditlog_controller.export(search, fmt="ndjson", with_payload=True)]
+        assert [json.loads(line)["request_args"] for line in lines] == [{"k": "v"}]
@@ -85,6 +85,11 @@ class TestAuthControl:
         }
         expired_token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
+        # The token is still present in the session store, so the JWT expiry is what rejects it
+        from app.utils.token_utils import store_token_in_redis
+
+        await store_token_in_redis(1, "unused.access.token", expired_token, "testuser", False)
+
         # We expect this to raise an exception, but it might be a 500 due to test setup
         try:
             await AuthControl.is_refresh_token_valid(expired_token)
@@ -92,3 +97,98 @@ class TestAuthControl:
         except HTTPException as e:
             # Could be 401 or 500 depending on test setup
             assert e.status_code in [401, 500]
+
+    async def test_is_authed_caches_principal(self):
+        """Test a validated token is served from the principal cache until invalidated"""
+        import jwt
+        from datetime import datetime
+        from app.core.auth_cache import principal_cache
+        from app.settings.config import settings
+
+        payload = {
+            "user_id": 42,
+            "username": "cached",
+            "is_superuser": False,
+            "exp": datetime.now().timestamp() + 3600,
+        }
+        token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+        mock_user = AsyncMock()
+        mock_user.id = 42
+        mock_user.username = "cached"
+        mock_user.is_superuser = False
+        mock_user.is_active = True
+        mock_validate = AsyncMock(return_value={"user_id": 42})
+
+        with (
+            patch("app.core.dependency.validate_access_token_from_redis", mock_validate),
+            patch("app.models.admin.User.filter") as mock_filter,
+        ):
+            mock_query = AsyncMock()
+            mock_query.first = AsyncMock(return_value=mock_user)
+            mock_filter.return_value = mock_query
+
+            first = await AuthControl.is_authed(token)
+            second = await AuthControl.is_authed(token)
+            assert first == second
+            assert first.id == 42
+            assert mock_validate.await_count == 1
+            assert mock_filter.call_count == 1
+
+            principal_cache.invalidate_user(42)
+            await AuthControl.is_authed(token)
+            assert mock_validate.await_count == 2
+
+    async def test_is_authed_stateless_mode_uses_revocation_filter(self):
+        """Test stateless mode skips the session store and honours synced revocations"""
+        import jwt
+        from datetime import datetime
+        from fastapi import HTTPException
+        from app.core.auth_cache import principal_cache
+        from app.core.revocation import RevocationFilter
+        from app.core.session_store import MemorySessionStore
+        from app.settings.config import settings
+        from app.utils.token_utils import hash_token
+
+        payload = {
+            "user_id": 43,
+            "username": "stateless",
+            "is_superuser": False,
+            "token_version": 0,
+            "exp": datetime.now().timestamp() + 3600,
+        }
+        token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+        mock_user = AsyncMock()
+        mock_user.id = 43
+        mock_user.username = "stateless"
+        mock_user.is_superuser = False
+        mock_user.is_active = True
+        mock_validate = AsyncMock(return_value=None)
+        store = MemorySessionStore()
+        revocations = RevocationFilter(interval=5, retention=3600)
+
+        with (
+            patch.object(settings, "AUTH_STATELESS", True),
+            patch("app.core.dependency.revocation_filter", revocations),
+            patch("app.core.revocation.get_session_store", return_value=store),
+            patch("app.core.dependency.validate_access_token_from_redis", mock_validate),
+            patch("app.models.admin.User.filter") as mock_filter,
+        ):
+            mock_query = AsyncMock()
+            mock_query.first = AsyncMock(return_value=mock_user)
+            mock_filter.return_value = mock_query
+            await revocations.sync()
+
+            user = await AuthControl.is_authed(token)
+            assert user.id == 43
+            mock_validate.assert_not_called()
+
+            # Another worker revokes all of the user's sessions
+            await store.log_revocation("user:43:1", datetime.now().timestamp(), retention=3600)
+            await revocations.sync()
+
+            with pytest.raises(HTTPException) as exc_info:
+                await AuthControl.is_authed(token)
+            assert exc_info.value.status_code == 401
+            assert principal_cache.get(hash_token(token)) is None
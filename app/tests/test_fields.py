@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from tortoise import Tortoise
+
+from app.models.admin import AuditLog
+from app.models.fields import ENVELOPE_KEY, CompressedJSONField
+
+
+class TestCompressedJSONField:
+    """Test cases for CompressedJSONField"""
+
+    def test_small_values_are_stored_as_plain_json(self):
+        """Test values below the threshold are not compressed"""
+        field = CompressedJSONField(threshold=1024)
+        assert field.to_db_value({"a": 1}, None) == json.dumps({"a": 1}, separators=(",", ":"))
+
+    def test_large_values_round_trip_through_envelope(self):
+        """Test values above the threshold are compressed and transparently decoded"""
+        field = CompressedJSONField(threshold=64)
+        value = {"items": [{"name": "item", "index": i} for i in range(200)]}
+
+        stored = field.to_db_value(value, None)
+        assert json.loads(stored)[ENVELOPE_KEY] == "zlib"
+        assert len(stored) < len(json.dumps(value)) / 5
+        assert field.to_python_value(stored) == value
+
+    def test_plain_text_and_legacy_rows(self):
+        """Test non-JSON text is saved as a JSON string and uncompressed legacy values still load"""
+        field = CompressedJSONField(threshold=64)
+        assert field.to_python_value(field.to_db_value("plain text", None)) == "plain text"
+        assert field.to_python_value('{"legacy": true}') == {"legacy": True}
+
+
+@pytest.mark.asyncio
+class TestCompressPayloads:
+    """Test cases for the audit log payload backfill"""
+
+    async def test_backfill_compresses_existing_rows(self, db):
+        """Test rows written uncompressed are rewritten with the compression envelope"""
+        from app.controllers.auditlog import auditlog_controller
+
+        payload = {"rows": ["x" * 50] * 100}
+        conn = Tortoise.get_connection("default")
+        table = AuditLog._meta.db_table
+        # 模拟压缩之前写入的旧数据
+        await conn.execute_query(
+            f"INSERT INTO {table} (user_id, username, module, summary, method, path, status, response_time, "
+            "request_args, response_body, response_truncated, created_at, updated_at) "
+            "VALUES (1, 'admin', '', '', 'GET', '/x', 200, 1, '{}', ?, 0, '2024-01-01', '2024-01-01')",
+            [json.dumps(payload)],
+        )
+
+        assert await auditlog_controller.compress_payloads(batch_size=10) == 1
+
+        _, rows = await conn.execute_query(f"SELECT response_body FROM {table}")
+        assert ENVELOPE_KEY in rows[0]["response_body"]
+        assert (await AuditLog.first()).response_body == payload
+
+    async def test_backfill_skips_processed_and_small_rows(self, db):
+        """Test repeated runs resume after the watermark and small payloads are not rewritten"""
+        from app.controllers.auditlog import auditlog_controller
+
+        await AuditLog.create(user_id=1, path="/small", request_args={"a": 1}, response_body={"code": 200})
+        large = await AuditLog.create(user_id=1, path="/large", request_args={}, response_body={"rows": ["x"] * 500})
+
+        assert await auditlog_controller.compress_payloads(batch_size=1, min_bytes=1024) == 1
+        assert await auditlog_controller.compress_payloads(batch_size=1, min_bytes=1024) == 0
+        assert await auditlog_controller.compress_payloads(min_bytes=1024, restart=True) == 1
+        assert (await AuditLog.get(id=large.id)).response_body == {"rows": ["x"] * 500}
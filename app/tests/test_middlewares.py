@@ -0,0 +1,262 @@
+import jwt
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.core.audit import ALWAYS, AuditPolicies, AuditPolicy, audit_policy, parse_policy
+from app.core.auth_cache import AuthedUser
+from app.core.dependency import AuthControl
+from app.core.middlewares import BodyCapture, HttpAuditLogMiddleware, RouteIndex
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(HttpAuditLogMiddleware, methods=["GET", "POST"], exclude_paths=["/docs"])
+
+    @app.post("/items", tags=["测试模块"], summary="创建条目")
+    async def create_item(item: dict):
+        return {"code": 200, "data": item}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"chunk{i};".encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/me")
+    async def me(user: AuthedUser = Depends(AuthControl.is_authed)):
+        return {"code": 200, "data": user.username}
+
+    @app.get("/docs-like/docs")
+    async def excluded():
+        return {"code": 200}
+
+    @app.post("/poll")
+    @audit_policy("metadata")
+    async def poll(item: dict):
+        return {"code": 200, "data": item}
+
+    @app.get("/status/{code}")
+    @audit_policy("errors")
+    async def status(code: int):
+        return JSONResponse({"code": code}, status_code=code)
+
+    @app.post("/reject")
+    @audit_policy("errors")
+    async def reject(item: dict):
+        return JSONResponse({"code": 400}, status_code=400)
+
+    @app.get("/sampled")
+    @audit_policy("sampled:0")
+    async def sampled():
+        return {"code": 200}
+
+    return app
+
+
+@pytest.mark.asyncio
+class TestHttpAuditLogMiddleware:
+    """Test cases for the pure ASGI HttpAuditLogMiddleware"""
+
+    async def test_captures_request_and_response(self):
+        """Test request args and the response body are captured without changing the response"""
+        mock_submit = AsyncMock()
+        with patch("app.core.middlewares.audit_sink.submit", mock_submit):
+            async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+                response = await client.post("/items?source=test", json={"name": "demo"})
+
+        assert response.json() == {"code": 200, "data": {"name": "demo"}}
+        record = mock_submit.await_args.args[0]
+        assert record["status"] == 200
+        assert record["module"] == "测试模块"
+        assert record["summary"] == "创建条目"
+        assert record["request_args"] == {"source": "test", "name": "demo"}
+        assert record["response_body"] == {"code": 200, "data": {"name": "demo"}}
+
+    async def test_streaming_response_passes_through(self):
+        """Test streamed chunks reach the client and are captured, and excluded paths are skipped"""
+        mock_submit = AsyncMock()
+        with patch("app.core.middlewares.audit_sink.submit", mock_submit):
+            async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+                response = await client.get("/stream")
+                await client.get("/docs-like/docs")
+
+        assert response.text == "chunk0;chunk1;chunk2;"
+        assert mock_submit.await_count == 1
+        assert mock_submit.await_args.args[0]["response_body"] == "chunk0;chunk1;chunk2;"
+        assert mock_submit.await_args.args[0]["response_truncated"] is False
+
+    async def test_large_streaming_response_is_truncated(self):
+        """Test only max_body_size bytes of a streamed response are kept, while the client gets everything"""
+        app = make_app()
+        mock_submit = AsyncMock()
+        with (
+            patch("app.core.middlewares.settings.AUDIT_MAX_BODY_SIZE", 10),
+            patch("app.core.middlewares.audit_sink.submit", mock_submit),
+        ):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/stream")
+
+        assert response.text == "chunk0;chunk1;chunk2;"
+        record = mock_submit.await_args.args[0]
+        assert record["response_body"] == "chunk0;chu"
+        assert record["response_truncated"] is True
+
+    async def test_large_request_body_is_flagged(self):
+        """Test a request body over max_body_size is not parsed and the record says so"""
+        mock_submit = AsyncMock()
+        with (
+            patch("app.core.middlewares.settings.AUDIT_MAX_BODY_SIZE", 10),
+            patch("app.core.middlewares.audit_sink.submit", mock_submit),
+        ):
+            async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+                response = await client.post("/items?source=test", json={"name": "a long enough name"})
+
+        assert response.status_code == 200
+        record = mock_submit.await_args.args[0]
+        assert record["request_args"] == {"source": "test"}
+        assert record["request_truncated"] is True
+
+    async def test_reuses_authenticated_user(self):
+        """Test the user resolved by the auth dependency is logged without authenticating again"""
+        from app.settings.config import settings
+
+        token = jwt.encode({"user_id": 7, "username": "alice"}, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+        mock_authenticate = AsyncMock(
+            return_value=AuthedUser(id=7, username="alice", is_superuser=False, is_active=True)
+        )
+        mock_submit = AsyncMock()
+        with (
+            patch.object(AuthControl, "authenticate", mock_authenticate),
+            patch("app.core.middlewares.audit_sink.submit", mock_submit),
+        ):
+            async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+                await client.get("/me", headers={"token": token})
+                # 未使用认证依赖的接口只解析token中的claims
+                await client.get("/stream", headers={"token": token})
+
+        assert mock_authenticate.await_count == 1
+        authed_record, claims_record = [call.args[0] for call in mock_submit.await_args_list]
+        assert (authed_record["user_id"], authed_record["username"]) == (7, "alice")
+        assert (claims_record["user_id"], claims_record["username"]) == (7, "alice")
+
+    async def test_route_policies(self):
+        """Test metadata routes skip body capture, errors routes log failures only and sampled:0 never logs"""
+        mock_submit = AsyncMock()
+        with patch("app.core.middlewares.audit_sink.submit", mock_submit):
+            async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+                response = await client.post("/poll", json={"name": "demo"})
+                await client.get("/status/200")
+                await client.get("/status/404")
+                await client.get("/sampled")
+
+        assert response.json() == {"code": 200, "data": {"name": "demo"}}
+        metadata_record, error_record = [call.args[0] for call in mock_submit.await_args_list]
+        assert metadata_record["path"] == "/poll"
+        assert metadata_record["status"] == 200
+        assert "request_args" not in metadata_record and "response_body" not in metadata_record
+        assert error_record["path"] == "/status/404"
+        assert error_record["response_body"] == {"code": 404}
+
+    async def test_errors_policy_defers_capture(self):
+        """Test errors routes keep only a request body prefix and skip response capture on success"""
+        mock_submit = AsyncMock()
+        with (
+            patch("app.core.middlewares.audit_sink.submit", mock_submit),
+            patch("app.core.middlewares.settings.AUDIT_ERRORS_REQUEST_BODY_SIZE", 32),
+            patch("app.core.middlewares.BodyCapture", wraps=BodyCapture) as capture,
+        ):
+            async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+                await client.get("/status/200")
+                # 成功的请求只创建了请求体的捕获
+                assert capture.call_count == 1
+                assert capture.call_args.args[0] == 32
+                await client.post("/reject", json={"name": "demo"})
+                await client.post("/reject", json={"name": "x" * 64})
+
+        small_record, large_record = [call.args[0] for call in mock_submit.await_args_list]
+        assert small_record["request_args"] == {"name": "demo"}
+        assert small_record["response_body"] == {"code": 400}
+        assert not small_record["request_truncated"]
+        assert large_record["request_truncated"]
+        assert large_record["response_body"] == {"code": 400}
+
+
+class TestBodyCapture:
+    """Test cases for BodyCapture"""
+
+    def test_keeps_at_most_limit_bytes(self):
+        """Test writes beyond the limit are counted but not stored"""
+        capture = BodyCapture(limit=8, size_hint=100)
+        assert len(capture.buffer) == 8
+        for chunk in (b"abc", b"defgh", b"ijk"):
+            capture.write(chunk)
+        assert capture.getvalue() == b"abcdefgh"
+        assert capture.total == 11
+        assert capture.truncated
+
+    def test_grows_without_size_hint(self):
+        """Test the buffer grows as needed when the body length is unknown"""
+        capture = BodyCapture(limit=1024)
+        capture.write(b"hello ")
+        capture.write(b"world")
+        assert capture.getvalue() == b"hello world"
+        assert not capture.truncated
+
+
+class TestRouteIndex:
+    """Test cases for RouteIndex"""
+
+    def test_lookup_by_matched_route(self):
+        """Test metadata is looked up from scope["route"] without scanning the routes"""
+        app = make_app()
+        index = RouteIndex()
+        index.build(app.routes)
+        route = next(route for route in app.routes if getattr(route, "path", "") == "/items")
+
+        assert index.lookup({"route": route}) == ("测试模块", "创建条目", ALWAYS)
+        assert index.lookup({}) is None
+
+
+class TestAuditPolicies:
+    """Test cases for audit policy parsing and resolution"""
+
+    def test_parse_policy(self):
+        """Test policy strings are parsed and invalid ones rejected"""
+        assert parse_policy("Errors") == AuditPolicy("errors")
+        assert parse_policy("sampled:0.25") == AuditPolicy("sampled", 0.25)
+        assert parse_policy("sampled:1").sample() == ALWAYS
+        for value in ("sometimes", "sampled", "sampled:2"):
+            with pytest.raises(ValueError):
+                parse_policy(value)
+
+    def test_resolution_order(self):
+        """Test declared policies win over path rules, which win over tag rules and the default"""
+        policies = AuditPolicies(
+            rules={"tag:系统监控": "never", "^/api/v1/monitor/runtime$": "metadata"}, default="errors"
+        )
+
+        @audit_policy("always")
+        async def declared():
+            pass
+
+        assert policies.for_route("/api/v1/monitor/runtime", ["系统监控"], declared) == ALWAYS
+        assert policies.for_route("/api/v1/monitor/runtime", ["系统监控"]) == AuditPolicy("metadata")
+        assert policies.for_route("/api/v1/monitor/cache", ["系统监控"]) == AuditPolicy("never")
+        assert policies.for_route("/api/v1/user/list", ["用户模块"]) == AuditPolicy("errors")
+        assert policies.for_path("/api/v1/monitor/runtime") == AuditPolicy("metadata")
+
+    def test_errors_policy_capture(self):
+        """Test errors policies bound the request body and capture responses only for failures"""
+        errors = AuditPolicy("errors")
+        assert errors.request_body_limit(1024, 64) == 64
+        assert ALWAYS.request_body_limit(1024, 64) == 1024
+        assert AuditPolicy("metadata").request_body_limit(1024, 64) == 0
+        assert not errors.capture_response(200)
+        assert errors.capture_response(500)
+        assert ALWAYS.capture_response(200)
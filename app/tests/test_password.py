@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.password import PasswordHasher, get_password_hash, verify_password
+
+
+@pytest.mark.asyncio
+class TestPasswordHasher:
+    """Test cases for PasswordHasher"""
+
+    async def test_hash_and_verify_in_executor(self):
+        """Test argon2 hashing and verification run through the executor"""
+        hasher = PasswordHasher(executor_type="thread", max_workers=2)
+        try:
+            hashed = await hasher.run(get_password_hash, "123456")
+            assert await hasher.run(verify_password, "123456", hashed)
+            assert not await hasher.run(verify_password, "654321", hashed)
+        finally:
+            hasher.shutdown()
+
+        stats = hasher.stats()
+        assert stats["completed"] == 3
+        assert stats["pending"] == 0
+        assert stats["running"] == 0
+
+    async def test_concurrency_is_bounded_and_queue_is_limited(self):
+        """Test at most max_workers run at once and excess callers are rejected"""
+        hasher = PasswordHasher(executor_type="thread", max_workers=1, max_queue=1)
+        try:
+            first = asyncio.create_task(hasher.run(time.sleep, 0.2))
+            second = asyncio.create_task(hasher.run(time.sleep, 0.2))
+            await asyncio.sleep(0.05)
+            assert hasher.running == 1
+            assert hasher.pending == 1
+
+            with pytest.raises(HTTPException) as exc_info:
+                await hasher.run(time.sleep, 0)
+            assert exc_info.value.status_code == 503
+
+            await asyncio.gather(first, second)
+        finally:
+            hasher.shutdown()
+
+        assert hasher.stats()["rejected"] == 1
+        assert hasher.stats()["max_pending"] == 1
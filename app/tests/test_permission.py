@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.permission import PermissionEngine
+
+
+def mock_values_list(return_value):
+    query = MagicMock()
+    query.values_list = AsyncMock(return_value=return_value)
+    return MagicMock(return_value=query)
+
+
+@pytest.mark.asyncio
+class TestPermissionEngine:
+    """Test cases for PermissionEngine"""
+
+    async def test_grants_are_compiled_once_per_role_combination(self):
+        """Test a warm permission check costs no DB queries"""
+        engine = PermissionEngine(maxsize=100, ttl=60)
+        role_filter = mock_values_list([1, 2])
+        api_filter = mock_values_list([(1, "GET", "/api/v1/user/list"), (2, "POST", "/api/v1/user/create")])
+
+        with (
+            patch("app.core.permission.Role.filter", role_filter),
+            patch("app.core.permission.Api.filter", api_filter),
+        ):
+            for _ in range(3):
+                role_ids = await engine.get_user_role_ids(1)
+                grants = await engine.get_grants(role_ids)
+
+        assert role_ids == frozenset({1, 2})
+        assert ("GET", "/api/v1/user/list") in grants
+        assert ("POST", "/api/v1/user/create") in grants
+        assert role_filter.call_count == 1
+        assert api_filter.call_count == 1
+
+    async def test_invalidate_role_recompiles_only_that_role(self):
+        """Test a role's API assignment change rebuilds its grants"""
+        engine = PermissionEngine(maxsize=100, ttl=60)
+        api_filter = mock_values_list([(1, "GET", "/a"), (2, "GET", "/b")])
+
+        with patch("app.core.permission.Api.filter", api_filter):
+            await engine.get_grants(frozenset({1, 2}))
+
+            engine.invalidate_role(2)
+            api_filter.return_value.values_list = AsyncMock(return_value=[(2, "GET", "/c")])
+            grants = await engine.get_grants(frozenset({1, 2}))
+
+        assert grants == frozenset({("GET", "/a"), ("GET", "/c")})
+        api_filter.assert_called_with(role_apis__id__in=[2])
+
+
+class TestRouteTrie:
+    """Test cases for RouteTrie"""
+
+    def test_match_resolves_path_parameters(self):
+        """Test request paths resolve to their route templates"""
+        from app.core.permission import RouteTrie
+
+        trie = RouteTrie()
+        trie.insert("GET", "/api/v1/gitlab/projects")
+        trie.insert("GET", "/api/v1/gitlab/projects/{project_id}")
+        trie.insert("GET", "/api/v1/gitlab/projects/{project_id}/tags")
+        trie.insert("GET", "/api/v1/gitlab/projects/search")
+
+        assert trie.match("GET", "/api/v1/gitlab/projects/12/tags") == "/api/v1/gitlab/projects/{project_id}/tags"
+        assert trie.match("GET", "/api/v1/gitlab/projects/12") == "/api/v1/gitlab/projects/{project_id}"
+        assert trie.match("GET", "/api/v1/gitlab/projects/search") == "/api/v1/gitlab/projects/search"
+        assert trie.match("GET", "/api/v1/gitlab/projects") == "/api/v1/gitlab/projects"
+        assert trie.match("POST", "/api/v1/gitlab/projects/12/tags") is None
+        assert trie.match("GET", "/api/v1/gitlab/projects/12/commits") is None
+
+    @pytest.mark.asyncio
+    async def test_resolve_path_prefers_matched_route(self):
+        """Test the matched route template is used when routing already happened"""
+        from fastapi.routing import APIRoute
+        from starlette.requests import Request
+
+        engine = PermissionEngine(maxsize=100, ttl=60)
+        route = APIRoute("/api/v1/gitlab/projects/{project_id}/tags", endpoint=lambda project_id: None)
+        request = Request({"type": "http", "method": "GET", "path": "/api/v1/gitlab/projects/3/tags", "route": route})
+
+        assert await engine.resolve_path(request) == "/api/v1/gitlab/projects/{project_id}/tags"
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import ResponseError
+
+from app.core.exceptions import SessionStoreUnavailable
+from app.core.redis import CircuitBreaker
+
+
+@pytest.mark.asyncio
+class TestCircuitBreaker:
+    """Test cases for the Redis CircuitBreaker"""
+
+    async def test_opens_after_threshold_and_fails_fast(self):
+        """Test the breaker stops calling Redis once it is open"""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        command = AsyncMock(side_effect=RedisConnectionError("down"))
+
+        for _ in range(2):
+            with pytest.raises(SessionStoreUnavailable):
+                await breaker.call(command)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(SessionStoreUnavailable):
+            await breaker.call(command)
+        assert command.await_count == 2
+        assert breaker.stats()["total_rejected"] == 1
+
+    async def test_half_open_probe_closes_on_success(self):
+        """Test a successful probe after reset_timeout closes the breaker"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        with pytest.raises(SessionStoreUnavailable):
+            await breaker.call(AsyncMock(side_effect=RedisConnectionError("down")))
+
+        with patch("app.core.redis.time.monotonic", return_value=breaker.opened_at + 31):
+            assert await breaker.call(AsyncMock(return_value="PONG")) == "PONG"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    async def test_half_open_probe_is_released_on_other_errors(self):
+        """Test a probe that raises a command error or is cancelled does not leave the breaker stuck half-open"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        with pytest.raises(SessionStoreUnavailable):
+            await breaker.call(AsyncMock(side_effect=RedisConnectionError("down")))
+
+        with patch("app.core.redis.time.monotonic", return_value=breaker.opened_at + 31):
+            with pytest.raises(asyncio.CancelledError):
+                await breaker.call(AsyncMock(side_effect=asyncio.CancelledError()))
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+
+            with pytest.raises(ResponseError):
+                await breaker.call(AsyncMock(side_effect=ResponseError("WRONGTYPE")))
+            assert breaker.state == CircuitBreaker.CLOSED
+
+        assert await breaker.call(AsyncMock(return_value="PONG")) == "PONG"
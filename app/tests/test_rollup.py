@@ -0,0 +1,122 @@
+import random
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app.controllers.auditlog_rollup import auditlog_rollup_controller
+from app.models.admin import AuditLog, AuditLogRollup, RollupWatermark
+from app.utils.sketch import LatencySketch
+
+
+class TestLatencySketch:
+    """Test cases for LatencySketch"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Test estimated percentiles stay within the configured relative error"""
+        values = sorted(random.lognormvariate(4, 1) for _ in range(5000))
+        sketch = LatencySketch(relative_accuracy=0.02)
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(sketch.quantile(q) - exact) / exact <= 0.021
+
+    def test_merge_equals_single_sketch(self):
+        """Test merging two sketches gives the same buckets as adding every value to one"""
+        first, second, combined = LatencySketch(), LatencySketch(), LatencySketch()
+        for value in [0, 3, 15, 80, 400]:
+            first.add(value)
+            combined.add(value)
+        for value in [1, 15, 2000]:
+            second.add(value)
+            combined.add(value)
+
+        first.merge(LatencySketch.from_dict(second.to_dict()))
+        assert first.buckets == combined.buckets
+        assert first.zero_count == combined.zero_count == 1
+
+
+@pytest.mark.asyncio
+class TestAuditLogRollup:
+    """Test cases for the incremental audit log rollup"""
+
+    async def test_incremental_rollup(self, db):
+        """Test new logs are folded into existing buckets exactly once"""
+        base = datetime(2024, 1, 1, 10, 0, 0)
+        await AuditLog.bulk_create(
+            [
+                AuditLog(
+                    user_id=1, method="GET", path="/api/v1/user/list", status=200, response_time=10, created_at=base
+                ),
+                AuditLog(
+                    user_id=1,
+                    method="GET",
+                    path="/api/v1/user/list",
+                    status=500,
+                    response_time=30,
+                    created_at=base + timedelta(seconds=20),
+                ),
+            ]
+        )
+        assert await auditlog_rollup_controller.rollup() == 2
+        assert await auditlog_rollup_controller.rollup() == 0
+
+        # 同一分钟内晚到的日志合并到已有的时间桶
+        await AuditLog.create(
+            user_id=1, method="GET", path="/api/v1/user/list", status=200, response_time=20, created_at=base
+        )
+        await AuditLog.create(
+            user_id=1,
+            method="GET",
+            path="/api/v1/user/list",
+            status=200,
+            response_time=5,
+            created_at=base + timedelta(minutes=5),
+        )
+        assert await auditlog_rollup_controller.rollup(batch_size=1) == 2
+        assert await AuditLogRollup.filter(granularity="minute").count() == 2
+
+        minutes = await auditlog_rollup_controller.query(granularity="minute")
+        assert [(row["bucket"], row["count"], row["error_count"], row["max_time"]) for row in minutes] == [
+            ("2024-01-01 10:00:00", 3, 1, 30),
+            ("2024-01-01 10:05:00", 1, 0, 5),
+        ]
+
+        (hour,) = await auditlog_rollup_controller.query(granularity="hour", merge=True)
+        assert hour["count"] == 4
+        assert hour["avg_time"] == 16.25
+        assert abs(hour["p50"] - 10) <= 0.5
+
+    async def test_late_committed_ids_are_rolled_up(self, db):
+        """Test ids that become visible after the watermark passed them are picked up from the gap list"""
+        base = datetime(2024, 1, 1, 10, 0, 0)
+
+        def make_log(log_id: int) -> AuditLog:
+            return AuditLog(
+                id=log_id, user_id=1, method="GET", path="/api/v1/user/list", response_time=10, created_at=base
+            )
+
+        # id 2 属于尚未提交的事务, 汇总时不可见
+        await AuditLog.bulk_create([make_log(1), make_log(3)])
+        assert await auditlog_rollup_controller.rollup() == 2
+        watermark = await RollupWatermark.get(name=auditlog_rollup_controller.watermark_name)
+        assert watermark.last_id == 3
+        assert list(watermark.gaps) == ["2"]
+
+        await make_log(2).save()
+        assert await auditlog_rollup_controller.rollup() == 1
+        (minute,) = await auditlog_rollup_controller.query(granularity="minute")
+        assert minute["count"] == 3
+        watermark = await RollupWatermark.get(name=auditlog_rollup_controller.watermark_name)
+        assert watermark.gaps == {}
+
+    async def test_expired_gaps_are_dropped(self, db):
+        """Test ids still missing after gap_seconds are no longer tracked"""
+        await AuditLog.bulk_create([AuditLog(id=1, user_id=1), AuditLog(id=5, user_id=1)])
+        assert await auditlog_rollup_controller.rollup() == 2
+        with patch.object(auditlog_rollup_controller, "gap_seconds", -1):
+            assert await auditlog_rollup_controller.rollup() == 0
+        watermark = await RollupWatermark.get(name=auditlog_rollup_controller.watermark_name)
+        assert watermark.gaps == {}
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from unittest.mock import patch
+
+from app.core.scheduler import Scheduler
+from app.core.session_store import MemorySessionStore
+
+
+@pytest.mark.asyncio
+class TestScheduler:
+    """Test cases for the periodic job Scheduler"""
+
+    async def test_skips_run_while_previous_is_running(self):
+        """Test a job is not started again until its previous run finishes"""
+        release = asyncio.Event()
+        calls = []
+
+        async def slow_job():
+            calls.append(1)
+            await release.wait()
+
+        scheduler = Scheduler()
+        job = scheduler.add_job("slow", slow_job, interval=60, leader_only=False)
+
+        await scheduler.run_once(job)
+        await asyncio.sleep(0)
+        await scheduler.run_once(job)
+        assert len(calls) == 1
+        assert job.skipped == 1
+
+        release.set()
+        await job.running
+        await scheduler.run_once(job)
+        await job.running
+        assert len(calls) == 2
+        assert job.runs == 2
+
+    async def test_leader_only_job_runs_on_one_instance(self):
+        """Test only the instance holding the lock runs a leader_only job"""
+        store = MemorySessionStore()
+        calls = []
+
+        async def cleanup():
+            calls.append(1)
+
+        first, second = Scheduler(), Scheduler()
+        first_job = first.add_job("cleanup", cleanup, interval=60)
+        second_job = second.add_job("cleanup", cleanup, interval=60)
+
+        with patch("app.core.scheduler.get_session_store", return_value=store):
+            await first.run_once(first_job)
+            await second.run_once(second_job)
+            await first_job.running
+
+        assert len(calls) == 1
+        assert second_job.running is None
+
+    async def test_lock_is_renewed_while_running_and_released_after(self):
+        """Test a leader_only job that outlives the lock TTL keeps the lock, and releases it when done"""
+        store = MemorySessionStore()
+        release = asyncio.Event()
+        calls = []
+
+        async def long_job():
+            calls.append(1)
+            await release.wait()
+
+        first, second = Scheduler(), Scheduler()
+        first_job = first.add_job("archive", long_job, interval=0.15, jitter=0)
+        second_job = second.add_job("archive", long_job, interval=0.15, jitter=0)
+
+        with patch("app.core.scheduler.get_session_store", return_value=store):
+            await first.run_once(first_job)
+            await asyncio.sleep(0.4)
+            await second.run_once(second_job)
+            assert len(calls) == 1
+            assert await store.get(first_job.lock_key) == first.instance_id
+
+            release.set()
+            await first_job.running
+            assert await store.get(first_job.lock_key) is None
+            await second.run_once(second_job)
+            await second_job.running
+
+        assert len(calls) == 2
+
+    async def test_local_jobs_registered_without_scheduler(self):
+        """Test per-worker jobs such as revocation_sync are registered even when SCHEDULER_ENABLED is off"""
+        from app.core.init_app import register_jobs
+
+        scheduler = Scheduler()
+        with (
+            patch("app.core.init_app.scheduler", scheduler),
+            patch("app.core.init_app.settings.SCHEDULER_ENABLED", False),
+            patch("app.core.init_app.settings.AUTH_STATELESS", True),
+        ):
+            register_jobs()
+
+        assert "revocation_sync" in scheduler.jobs
+        assert "token_cleanup" not in scheduler.jobs
+        assert not any(job.leader_only for job in scheduler.jobs.values())
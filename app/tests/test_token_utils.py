@@ -0,0 +1,109 @@
+import json
+
+import jwt
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.session_store import MemorySessionStore, RedisSessionStore
+from app.utils.token_utils import (
+    get_legacy_token_key,
+    get_token_key,
+    hash_token,
+    revoke_all_user_tokens_in_redis,
+    store_token_in_redis,
+    token_version_cache,
+    validate_access_token_from_redis,
+    validate_refresh_token_from_redis,
+)
+
+
+class FakePipeline:
+    """Records pipelined commands"""
+
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.calls.append((name, args))
+            return self
+
+        return command
+
+    async def execute(self):
+        self.calls.append(("execute", ()))
+        return []
+
+
+@pytest.fixture
+def store():
+    store = MemorySessionStore()
+    with patch("app.utils.token_utils.get_session_store", return_value=store):
+        yield store
+    token_version_cache.clear()
+
+
+@pytest.mark.asyncio
+class TestTokenUtils:
+    """Test cases for token_utils"""
+
+    async def test_token_key_is_derived_from_token_hash(self):
+        """Test token key layout"""
+        key = get_token_key("some.jwt.token", "access")
+        assert key == f"token:access:{hash_token('some.jwt.token')}"
+        assert "some.jwt.token" not in key
+        assert get_token_key("some.jwt.token", "refresh") != key
+
+    async def test_store_validate_and_revoke_all(self, store):
+        """Test issued tokens validate with a single key lookup and are revoked together"""
+        await store_token_in_redis(1, "access.jwt", "refresh.jwt", "admin", True)
+
+        assert (await validate_access_token_from_redis("access.jwt"))["username"] == "admin"
+        assert (await validate_refresh_token_from_redis("refresh.jwt"))["user_id"] == 1
+        assert await validate_access_token_from_redis("refresh.jwt") is None
+
+        await revoke_all_user_tokens_in_redis(1)
+        assert await validate_access_token_from_redis("access.jwt") is None
+        assert await validate_refresh_token_from_redis("refresh.jwt") is None
+
+    async def test_validate_migrates_legacy_key(self, store):
+        """Test a token stored under the legacy layout is moved to the token index"""
+        token = jwt.encode({"user_id": 7}, "secret", algorithm="HS256")
+        legacy_key = get_legacy_token_key(7, token, "access")
+        await store.set_many([(legacy_key, json.dumps({"user_id": 7}), 60)])
+
+        data = await validate_access_token_from_redis(token)
+
+        assert data == {"user_id": 7}
+        assert await store.get(legacy_key) is None
+        assert await store.get(get_token_key(token, "access")) is not None
+
+    async def test_revoke_all_bumps_token_version(self, store):
+        """Test revoking all sessions is a single counter increment that rejects older tokens"""
+        await store_token_in_redis(3, "old.access", "old.refresh", "user", False, token_version=0)
+        await revoke_all_user_tokens_in_redis(3)
+        assert await store.get_int("token_version:3") == 1
+
+        await store_token_in_redis(3, "new.access", "new.refresh", "user", False, token_version=1)
+        assert await validate_access_token_from_redis("old.access") is None
+        assert await validate_refresh_token_from_redis("old.refresh") is None
+        assert (await validate_access_token_from_redis("new.access"))["token_version"] == 1
+
+    async def test_redis_issuance_is_a_single_transaction(self):
+        """Test the Redis store writes both tokens in one MULTI/EXEC"""
+        calls = []
+        mock_redis = AsyncMock()
+        mock_redis.pipeline = MagicMock(side_effect=lambda transaction=True: FakePipeline(calls))
+
+        with patch("app.core.session_store.get_redis", AsyncMock(return_value=mock_redis)):
+            await RedisSessionStore().set_many([("a", "1", 1), ("b", "2", 2)])
+
+        mock_redis.pipeline.assert_called_once_with(transaction=True)
+        assert [name for name, _ in calls] == ["psetex", "psetex", "execute"]
+        mock_redis.setex.assert_not_called()
@@ -17,13 +17,17 @@ def create_refresh_token(*, data: RefreshTokenPayload):
     return encoded_jwt
 
 
-def create_tokens(*, user_id: int, username: str, is_superuser: bool):
+def create_tokens(*, user_id: int, username: str, is_superuser: bool, token_version: int = 0):
     # Create access token
     access_token_expires = timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token_expire = datetime.now(timezone.utc) + access_token_expires
 
     access_token_payload = JWTPayload(
-        user_id=user_id, username=username, is_superuser=is_superuser, exp=access_token_expire
+        user_id=user_id,
+        username=username,
+        is_superuser=is_superuser,
+        token_version=token_version,
+        exp=access_token_expire,
     )
 
     access_token = create_access_token(data=access_token_payload)
@@ -33,7 +37,11 @@ def create_tokens(*, user_id: int, username: str, is_superuser: bool):
     refresh_token_expire = datetime.now(timezone.utc) + refresh_token_expires
 
     refresh_token_payload = RefreshTokenPayload(
-        user_id=user_id, username=username, is_superuser=is_superuser, exp=refresh_token_expire
+        user_id=user_id,
+        username=username,
+        is_superuser=is_superuser,
+        token_version=token_version,
+        exp=refresh_token_expire,
     )
 
     refresh_token = create_refresh_token(data=refresh_token_payload)
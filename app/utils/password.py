@@ -1,6 +1,14 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi.exceptions import HTTPException
 from passlib import pwd
 from passlib.context import CryptContext
 
+from app.settings.config import settings
+
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 
@@ -14,3 +22,99 @@ def get_password_hash(password: str) -> str:
 
 def generate_password() -> str:
     return pwd.genword()
+
+
+class PasswordHasher:
+    """
+    在线程池或进程池中执行argon2哈希/校验, 避免阻塞事件循环
+    同时执行的任务数不超过 max_workers, 排队数超过 max_queue 时直接拒绝(0表示不限制)
+    """
+
+    def __init__(self, executor_type: str, max_workers: int, max_queue: int = 0):
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.running = 0
+        self.max_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+
+    async def run(self, func: Callable, *args):
+        if self.max_queue and self.pending >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试")
+
+        queued_at = time.perf_counter()
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        acquired = False
+        try:
+            async with self._get_semaphore():
+                acquired = True
+                self.pending -= 1
+                self.running += 1
+                started_at = time.perf_counter()
+                self.total_wait_ms += (started_at - queued_at) * 1000
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self._get_executor(), func, *args)
+                finally:
+                    self.running -= 1
+                    self.completed += 1
+                    self.total_run_ms += (time.perf_counter() - started_at) * 1000
+        finally:
+            if not acquired:
+                self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_type,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "running": self.running,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_ms / self.completed, 2) if self.completed else 0,
+            "avg_run_ms": round(self.total_run_ms / self.completed, 2) if self.completed else 0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+
+password_hasher = PasswordHasher(
+    executor_type=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
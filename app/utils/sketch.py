@@ -0,0 +1,65 @@
+import math
+from typing import Dict, Optional
+
+
+class LatencySketch:
+    """
+    可合并的对数分桶直方图(DDSketch思路), 用于估算响应时间的分位数
+    值 v 落在第 ceil(log_gamma(v)) 个桶中, 估算值的相对误差不超过 relative_accuracy;
+    两个sketch合并只需把相同桶的计数相加, 因此可以由分钟汇总合并出小时或任意时间段的分位数
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, buckets: Optional[Dict[int, int]] = None, zero_count: int = 0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = buckets or {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= 0:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "LatencySketch") -> None:
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # 桶 (gamma^(i-1), gamma^i] 的代表值, 与桶内任意值的相对误差不超过 relative_accuracy
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.relative_accuracy,
+            "zero": self.zero_count,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "LatencySketch":
+        if not data:
+            return cls()
+        return cls(
+            relative_accuracy=data.get("alpha", 0.02),
+            buckets={int(index): count for index, count in data.get("buckets", {}).items()},
+            zero_count=data.get("zero", 0),
+        )
@@ -1,124 +1,196 @@
+import hashlib
 import json
 import time
 from typing import Optional
 
-from app.core.redis import get_redis
+import jwt
+
+from app.core.auth_cache import principal_cache
+from app.core.revocation import revocation_filter
+from app.core.session_store import get_session_store
 from app.settings.config import settings
+from app.utils.cache import TTLCache
+
+# 用户token版本号的进程内缓存, 其他进程执行的撤销最多延迟 TOKEN_VERSION_CACHE_TTL_SECONDS 生效
+token_version_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAXSIZE, ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS)
+
+
+def hash_token(token: str) -> str:
+    """计算token的摘要, 作为会话存储中token索引的key"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_token_key(token: str, token_type: str = "access") -> str:
+    """token索引key: token:{token_type}:{sha256(token)}, 验证/撤销都是单key操作"""
+    return f"token:{token_type}:{hash_token(token)}"
+
+
+def get_legacy_token_key(user_id: int, token: str, token_type: str = "access") -> str:
+    """旧版token key: {token_type}_token:{user_id}:{token}"""
+    return f"{token_type}_token:{user_id}:{token}"
 
 
-async def store_token_in_redis(user_id: int, access_token: str, refresh_token: str, username: str, is_superuser: bool):
-    """将token存储在Redis中"""
-    redis_client = await get_redis()
+def get_token_version_key(user_id: int) -> str:
+    """用户token版本号key, 撤销用户所有token时自增"""
+    return f"token_version:{user_id}"
+
+
+async def get_token_version(user_id: int, use_cache: bool = True) -> int:
+    """
+    获取用户当前的token版本号, 版本号低于它的token均视为已撤销
+    签发token时应使用 use_cache=False 读取最新值, 避免签发出已失效的token
+    """
+    if use_cache:
+        version = token_version_cache.get(user_id)
+        if version is not None:
+            return version
+    version = await get_session_store().get_int(get_token_version_key(user_id))
+    token_version_cache.set(user_id, version)
+    return version
+
+
+async def store_token_in_redis(
+    user_id: int,
+    access_token: str,
+    refresh_token: str,
+    username: str,
+    is_superuser: bool,
+    token_version: int = 0,
+):
+    """将token存储在会话存储中"""
+    store = get_session_store()
 
     # 计算过期时间（秒）
     access_token_expire = settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
     refresh_token_expire = settings.JWT_REFRESH_TOKEN_EXPIRE_MINUTES * 60
 
     # 存储access token
-    access_token_key = f"access_token:{user_id}:{access_token}"
+    access_token_key = get_token_key(access_token, "access")
     access_token_data = {
         "user_id": user_id,
         "username": username,
         "is_superuser": is_superuser,
         "token": access_token,
+        "token_version": token_version,
         "created_at": int(time.time()),
     }
-    await redis_client.setex(access_token_key, access_token_expire, json.dumps(access_token_data))
 
     # 存储refresh token
-    refresh_token_key = f"refresh_token:{user_id}:{refresh_token}"
+    refresh_token_key = get_token_key(refresh_token, "refresh")
     refresh_token_data = {
         "user_id": user_id,
         "username": username,
         "is_superuser": is_superuser,
         "token": refresh_token,
+        "token_version": token_version,
         "created_at": int(time.time()),
     }
-    await redis_client.setex(refresh_token_key, refresh_token_expire, json.dumps(refresh_token_data))
 
-    # 存储用户的所有token，用于登出时全部清除
-    user_tokens_key = f"user_tokens:{user_id}"
-    await redis_client.sadd(user_tokens_key, access_token_key, refresh_token_key)
-    # 设置用户token集合的过期时间与refresh token相同
-    await redis_client.expire(user_tokens_key, refresh_token_expire)
+    # 原子写入两个token; 登出时通过自增token版本号撤销, 无需维护用户的token集合
+    await store.set_many(
+        [
+            (access_token_key, json.dumps(access_token_data), access_token_expire),
+            (refresh_token_key, json.dumps(refresh_token_data), refresh_token_expire),
+        ]
+    )
 
 
-async def validate_access_token_from_redis(token: str) -> Optional[dict]:
-    """从Redis验证access token"""
-    redis_client = await get_redis()
+async def _migrate_legacy_token(store, legacy_key: str, user_id: int, token: str, token_type: str) -> Optional[str]:
+    """将旧版key迁移到token索引, 保留剩余过期时间, 返回token数据"""
+    token_data, ttl = await store.get_with_ttl(legacy_key)
+    if not token_data or ttl is None or ttl <= 0:
+        return None
 
-    # 查找所有可能的access token key
-    pattern = f"access_token:*:{token}"
-    keys = await redis_client.keys(pattern)
+    # 先写新key再删除旧key, 中途失败时旧key仍在, 可以重复迁移
+    await store.set_many([(get_token_key(token, token_type), token_data, ttl)])
+    await store.delete(legacy_key)
+    return token_data
 
-    if not keys:
-        return None
 
-    # 获取第一个匹配的token数据
-    token_data = await redis_client.get(keys[0])
+async def _get_token_data(token: str, token_type: str) -> Optional[dict]:
+    store = get_session_store()
+
+    token_data = await store.get(get_token_key(token, token_type))
     if not token_data:
+        # 兼容旧版key: 从未校验的claims中取user_id, 直接定位旧key并迁移
+        try:
+            claims = jwt.decode(token, options={"verify_signature": False, "verify_exp": False})
+        except jwt.PyJWTError:
+            return None
+        user_id = claims.get("user_id")
+        if user_id is None:
+            return None
+        legacy_key = get_legacy_token_key(user_id, token, token_type)
+        token_data = await _migrate_legacy_token(store, legacy_key, user_id, token, token_type)
+        if not token_data:
+            return None
+
+    token_data = json.loads(token_data)
+    if token_data.get("token_version", 0) < await get_token_version(token_data["user_id"]):
         return None
-
-    return json.loads(token_data)
+    return token_data
 
 
-async def validate_refresh_token_from_redis(token: str) -> Optional[dict]:
-    """从Redis验证refresh token"""
-    redis_client = await get_redis()
+async def validate_access_token_from_redis(token: str) -> Optional[dict]:
+    """从会话存储验证access token"""
+    return await _get_token_data(token, "access")
 
-    # 查找所有可能的refresh token key
-    pattern = f"refresh_token:*:{token}"
-    keys = await redis_client.keys(pattern)
 
-    if not keys:
-        return None
+async def validate_refresh_token_from_redis(token: str) -> Optional[dict]:
+    """从会话存储验证refresh token"""
+    return await _get_token_data(token, "refresh")
 
-    # 获取第一个匹配的token数据
-    token_data = await redis_client.get(keys[0])
-    if not token_data:
-        return None
 
-    return json.loads(token_data)
+async def _log_revocation(store, member: str):
+    """写入撤销日志, 并立即应用到本进程的撤销过滤器"""
+    timestamp = time.time()
+    await store.log_revocation(member, timestamp, retention=settings.JWT_REFRESH_TOKEN_EXPIRE_MINUTES * 60)
+    revocation_filter.apply(member, timestamp)
 
 
 async def revoke_token_in_redis(user_id: int, token: str, token_type: str = "access"):
-    """在Redis中撤销token"""
-    redis_client = await get_redis()
+    """在会话存储中撤销token"""
+    store = get_session_store()
 
     # 构造token key
-    token_key = f"{token_type}_token:{user_id}:{token}"
+    token_key = get_token_key(token, token_type)
+    legacy_key = get_legacy_token_key(user_id, token, token_type)
 
-    # 从用户token集合中移除
-    user_tokens_key = f"user_tokens:{user_id}"
-    await redis_client.srem(user_tokens_key, token_key)
-
-    # 删除token
-    await redis_client.delete(token_key)
+    await store.delete(token_key, legacy_key)
+    principal_cache.invalidate_token(hash_token(token))
+    if token_type == "access":
+        # 无状态校验模式下access token不查询会话存储, 需要通过撤销日志同步到各进程
+        await _log_revocation(store, f"token:{hash_token(token)}")
 
 
 async def revoke_all_user_tokens_in_redis(user_id: int):
-    """撤销用户的所有token"""
-    redis_client = await get_redis()
-
-    # 获取用户的所有token key
-    user_tokens_key = f"user_tokens:{user_id}"
-    token_keys = await redis_client.smembers(user_tokens_key)
-
-    if token_keys:
-        # 删除所有token
-        if token_keys:
-            await redis_client.delete(*token_keys)
-
-        # 删除用户token集合
-        await redis_client.delete(user_tokens_key)
+    """撤销用户的所有token: 自增用户的token版本号, 之前签发的token全部失效"""
+    store = get_session_store()
+    version = await store.incr(get_token_version_key(user_id))
+    token_version_cache.set(user_id, version)
+    principal_cache.invalidate_user(user_id)
+    await _log_revocation(store, f"user:{user_id}:{version}")
 
 
 async def is_token_revoked_in_redis(user_id: int, token: str, token_type: str = "access") -> bool:
     """检查token是否已被撤销"""
-    redis_client = await get_redis()
-
-    # 构造token key
-    token_key = f"{token_type}_token:{user_id}:{token}"
-
-    # 检查token是否存在
-    return not await redis_client.exists(token_key)
+    return await _get_token_data(token, token_type) is None
+
+
+async def migrate_legacy_tokens_in_redis(batch_size: int = 500) -> int:
+    """
+    将旧版 {token_type}_token:{user_id}:{token} 布局的token批量迁移到token索引
+    使用SCAN遍历, 不会阻塞Redis, 可重复执行
+    """
+    store = get_session_store()
+
+    migrated = 0
+    for token_type in ("access", "refresh"):
+        async for legacy_key in store.scan_iter(match=f"{token_type}_token:*", count=batch_size):
+            parts = legacy_key.split(":", 2)
+            if len(parts) != 3 or not parts[1].isdigit():
+                continue
+            _, user_id, token = parts
+            if await _migrate_legacy_token(store, legacy_key, int(user_id), token, token_type):
+                migrated += 1
+    return migrated
@@ -0,0 +1,97 @@
+"""
+审计日志中间件的吞吐量对比: 无中间件 / 纯ASGI审计中间件 / 基线(c2bed6a)基于 BaseHTTPMiddleware 的审计中间件
+审计记录的写入被替换为空操作, 只衡量中间件自身的开销; 每种情况运行 --runs 次, 输出中位数和范围
+"""
+
+import argparse
+import asyncio
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+
+from app.core.middlewares import HttpAuditLogMiddleware  # noqa: E402
+from benchmarks.baseline_audit_middleware import HttpAuditLogMiddleware as BaselineAuditLogMiddleware  # noqa: E402
+
+
+def make_app(middleware: str) -> FastAPI:
+    app = FastAPI()
+    if middleware == "audit":
+        app.add_middleware(HttpAuditLogMiddleware, methods=["GET", "POST"], exclude_paths=[])
+    elif middleware == "baseline":
+        app.add_middleware(BaselineAuditLogMiddleware, methods=["GET", "POST"], exclude_paths=[])
+
+    @app.post("/items", tags=["bench"], summary="create item")
+    async def create_item(item: dict):
+        return {"code": 200, "data": item}
+
+    @app.get("/stream", tags=["bench"], summary="stream")
+    async def stream():
+        async def chunks():
+            for _ in range(16):
+                yield b"x" * 4096
+
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    return app
+
+
+async def _noop_submit(data: dict) -> bool:
+    return True
+
+
+async def _noop_create(**data) -> None:
+    return None
+
+
+async def bench(middleware: str, requests: int, concurrency: int) -> float:
+    app = make_app(middleware)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def worker(count: int):
+            for i in range(count):
+                if i % 2:
+                    await client.get("/stream")
+                else:
+                    await client.post("/items", json={"name": "bench", "index": i})
+
+        await worker(50)  # 预热
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(requests // concurrency) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return requests / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=4000, help="Number of requests per case")
+    parser.add_argument("--concurrency", type=int, default=20, help="Number of concurrent clients")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per case")
+    args = parser.parse_args()
+
+    print(f"python={platform.python_version()} platform={platform.platform()} cpus={os.cpu_count()}")
+    print(f"requests={args.requests} concurrency={args.concurrency} runs={args.runs}")
+    cases = [("no middleware", "none"), ("audit (pure ASGI)", "audit"), ("audit (baseline)", "baseline")]
+    with (
+        patch("app.core.middlewares.audit_sink.submit", _noop_submit),
+        patch("benchmarks.baseline_audit_middleware.AuditLog.create", _noop_create),
+    ):
+        for label, middleware in cases:
+            results = [await bench(middleware, args.requests, args.concurrency) for _ in range(args.runs)]
+            print(
+                f"{label:<20} median {statistics.median(results):>7.0f} req/s"
+                f"  (min {min(results):.0f}, max {max(results):.0f})"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
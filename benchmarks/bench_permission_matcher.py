@@ -0,0 +1,76 @@
+"""
+RouteTrie 与线性正则匹配的路由模板解析耗时对比
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from starlette.routing import compile_path  # noqa: E402
+
+from app.core.permission import RouteTrie  # noqa: E402
+
+METHODS = ["GET", "POST", "PUT", "DELETE"]
+
+
+def build_templates(count: int) -> list[tuple[str, str]]:
+    templates = []
+    for i in range(count):
+        module = f"module{i // 20}"
+        method = METHODS[i % len(METHODS)]
+        if i % 3 == 0:
+            templates.append((method, f"/api/v1/{module}/items{i}/{{item_id}}/detail"))
+        elif i % 3 == 1:
+            templates.append((method, f"/api/v1/{module}/items{i}/{{item_id}}"))
+        else:
+            templates.append((method, f"/api/v1/{module}/items{i}/list"))
+    return templates
+
+
+def concrete_path(template: str) -> str:
+    return template.replace("{item_id}", str(random.randint(1, 10**6)))
+
+
+def bench(label: str, func, requests: list[tuple[str, str]]) -> None:
+    start = time.perf_counter()
+    for method, path in requests:
+        func(method, path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {elapsed * 1e6 / len(requests):>10.2f} us/lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--apis", type=int, default=5000, help="Number of registered APIs")
+    parser.add_argument("--requests", type=int, default=20000, help="Number of lookups")
+    args = parser.parse_args()
+
+    templates = build_templates(args.apis)
+    requests = [(method, concrete_path(template)) for method, template in random.choices(templates, k=args.requests)]
+
+    trie = RouteTrie()
+    for method, template in templates:
+        trie.insert(method, template)
+
+    compiled = [(method, compile_path(template)[0], template) for method, template in templates]
+
+    def linear_match(method: str, path: str):
+        for route_method, regex, template in compiled:
+            if route_method == method and regex.match(path):
+                return template
+        return None
+
+    for method, path in requests[:100]:
+        assert trie.match(method, path) == linear_match(method, path)
+
+    print(f"apis={args.apis} lookups={args.requests}")
+    bench("radix trie", trie.match, requests)
+    bench("linear regex", linear_match, requests)
+
+
+if __name__ == "__main__":
+    main()
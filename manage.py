@@ -17,8 +17,10 @@ if env_path.exists():
     load_dotenv(dotenv_path=env_path, override=True)
 
 from app import app
+from app.commands.compress_audit_logs import CompressAuditLogsCommand
 from app.commands.import_menu_api import ImportMenuAPICommand
 from app.commands.manager import CommandManager
+from app.commands.migrate_tokens import MigrateTokensCommand
 from app.commands.reset_db import ResetDBCommand
 
 
@@ -29,6 +31,8 @@ def main():
     # Register commands
     command_manager.register("reset_db", ResetDBCommand)
     command_manager.register("import_menu_api", ImportMenuAPICommand)
+    command_manager.register("migrate_tokens", MigrateTokensCommand)
+    command_manager.register("compress_audit_logs", CompressAuditLogsCommand)
 
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Custom command management tool.")
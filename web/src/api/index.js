@@ -41,6 +41,7 @@ export default {
   deleteDept: (params = {}) => request.delete('/dept/delete', { params }),
   // auditlog
   getAuditLogList: (params = {}) => request.get('/auditlog/list', { params }),
+  getAuditLog: (params = {}) => request.get('/auditlog/get', { params }),
   // gitlab
   getGitLabProjects: (params = {}) => request.get('/gitlab/projects', { params }),
   getGitLabProjectDetails: (projectId) => request.get(`/gitlab/projects/${projectId}`),